@@ -0,0 +1,346 @@
+# Summary: This module contains technical indicators computed from a stock's price history.
+# Every function takes NumPy arrays (e.g. stock.series.close) and runs in O(n) with vectorized
+# operations. Results are arrays the same length as the input, with NaN where a window is not full.
+
+import math
+from collections import deque
+import numpy as np
+
+TRADING_DAYS = 252 # used to annualize volatility
+
+def _as_float(values):
+    return np.asarray(values, dtype=np.float64)
+
+# Sum of each window of values ending at each position (running sum differences)
+def _rolling_sum(values, window):
+    total = np.concatenate(([0.0], np.cumsum(values)))
+    result = np.full(len(values), np.nan)
+    if window <= len(values):
+        result[window - 1:] = total[window:] - total[:-window]
+    return result
+
+# Simple moving average over window days
+def sma(values, window):
+    if window < 1:
+        raise ValueError("Window must be at least 1")
+    values = _as_float(values)
+    return _rolling_sum(values, window) / window
+
+# Exponential smoothing y[0] = start, y[t] = (1 - alpha) * y[t-1] + alpha * x[t].
+# The recursion is solved in closed form one block at a time: inside a block
+# y[t] = d^t * (start + alpha * sum(x[k] / d^k)) with d = 1 - alpha, and blocks
+# are kept short enough that d^-k stays well inside float range.
+def _smooth(values, alpha, start):
+    result = np.empty(len(values))
+    if len(values) == 0:
+        return result
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        result[:] = values
+        result[0] = start
+        return result
+    block = max(1, min(len(values), int(100 / -math.log10(decay)))) if decay < 1.0 else len(values)
+    powers = decay ** np.arange(block + 1)
+    inverse = 1.0 / powers
+    previous = start
+    result[0] = start
+    position = 1
+    while position < len(values):
+        chunk = values[position:position + block]
+        size = len(chunk)
+        weighted = np.cumsum(chunk * inverse[1:size + 1])
+        result[position:position + size] = powers[1:size + 1] * (previous + alpha * weighted)
+        previous = result[position + size - 1]
+        position = position + size
+    return result
+
+# Exponential moving average with span days (alpha = 2 / (span + 1)), seeded with the first value
+def ema(values, span):
+    if span < 1:
+        raise ValueError("Span must be at least 1")
+    values = _as_float(values)
+    if len(values) == 0:
+        return values.copy()
+    return _smooth(values, 2.0 / (span + 1.0), values[0])
+
+# Day over day fractional change in price (first day is NaN)
+def daily_returns(close):
+    close = _as_float(close)
+    result = np.full(len(close), np.nan)
+    result[1:] = close[1:] / close[:-1] - 1.0
+    return result
+
+# Standard deviation of daily returns over window days, annualized by default
+def rolling_volatility(close, window=20, annualize=True):
+    if window < 2:
+        raise ValueError("Window must be at least 2")
+    close = _as_float(close)
+    returns = daily_returns(close)[1:]
+    result = np.full(len(close), np.nan)
+    if len(returns) >= window:
+        # center on the mean first so the running sums don't lose precision
+        centered = returns - returns.mean()
+        total = _rolling_sum(centered, window)[window - 1:]
+        squares = _rolling_sum(centered * centered, window)[window - 1:]
+        variance = np.maximum((squares - total * total / window) / (window - 1), 0.0)
+        result[window:] = np.sqrt(variance)
+    if annualize:
+        result = result * math.sqrt(TRADING_DAYS)
+    return result
+
+# Volume weighted average price, cumulative or over a rolling window of days
+def vwap(close, volume, window=None):
+    close = _as_float(close)
+    volume = _as_float(volume)
+    if window is None:
+        traded = np.cumsum(close * volume)
+        shares = np.cumsum(volume)
+    else:
+        traded = _rolling_sum(close * volume, window)
+        shares = _rolling_sum(volume, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return traded / shares
+
+# Fractional decline from the running high (0 at a new high, -0.25 is 25% below the high)
+def drawdown(close):
+    close = _as_float(close)
+    if len(close) == 0:
+        return close.copy()
+    return close / np.maximum.accumulate(close) - 1.0
+
+# Largest drawdown in the history (a negative fraction, 0 if prices never fell)
+def max_drawdown(close):
+    values = drawdown(close)
+    return float(values.min()) if len(values) else 0.0
+
+# Average gain and loss for RSI from day period onward (needs more than period days).
+# The first average is a simple mean of period days, then Wilder smoothing (alpha = 1 / period).
+def _wilder_averages(close, period):
+    change = np.diff(close)
+    gains = np.maximum(change, 0.0)
+    losses = np.maximum(-change, 0.0)
+    average_gain = _smooth(gains[period - 1:], 1.0 / period, gains[:period].mean())
+    average_loss = _smooth(losses[period - 1:], 1.0 / period, losses[:period].mean())
+    return average_gain, average_loss
+
+# Relative Strength Index using Wilder's smoothing over period days
+def rsi(close, period=14):
+    if period < 1:
+        raise ValueError("Period must be at least 1")
+    close = _as_float(close)
+    result = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return result
+    average_gain, average_loss = _wilder_averages(close, period)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        strength = average_gain / average_loss
+        result[period:] = np.where(average_loss == 0.0, 100.0, 100.0 - 100.0 / (1.0 + strength))
+    return result
+
+# All indicators for one stock as a dict of arrays aligned with stock.series.dates
+def stock_indicators(stock, sma_window=20, ema_span=20, volatility_window=20, rsi_period=14):
+    stock.series.sort()
+    close = stock.series.close
+    volume = stock.series.volume
+    return {
+        "date": stock.series.dates,
+        "close": close,
+        "sma": sma(close, sma_window),
+        "ema": ema(close, ema_span),
+        "returns": daily_returns(close),
+        "volatility": rolling_volatility(close, volatility_window),
+        "vwap": vwap(close, volume),
+        "drawdown": drawdown(close),
+        "rsi": rsi(close, rsi_period),
+    }
+
+# Indicators for every stock in a portfolio: {symbol: stock_indicators(...)}
+def portfolio_indicators(stock_list, **options):
+    return {stock.symbol: stock_indicators(stock, **options) for stock in stock_list}
+
+# Streaming indicators --------------------------------------------------------------
+# These keep running state so a new day updates each indicator in O(1) instead of
+# recalculating the whole history. Values match the last element of the array versions.
+
+# Mean and variance over the last window values (Welford's method, with the oldest
+# value removed by reversing its update once the window is full)
+class RollingStats:
+    def __init__(self, window):
+        self.window = window
+        self._values = deque()
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        if len(self._values) == self.window:
+            old = self._values.popleft()
+            count = len(self._values)
+            if count == 0:
+                self._mean = 0.0
+                self._m2 = 0.0
+            else:
+                delta = old - self._mean
+                self._mean = self._mean - delta / count
+                self._m2 = self._m2 - delta * (old - self._mean)
+        self._values.append(value)
+        delta = value - self._mean
+        self._mean = self._mean + delta / len(self._values)
+        self._m2 = self._m2 + delta * (value - self._mean)
+
+    @property
+    def full(self):
+        return len(self._values) == self.window
+
+    @property
+    def mean(self):
+        return self._mean if self.full else math.nan
+
+    @property
+    def variance(self):
+        if not self.full or self.window < 2:
+            return math.nan
+        return max(self._m2 / (self.window - 1), 0.0)
+
+class EmaAccumulator:
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = math.nan
+
+    def add(self, value):
+        if math.isnan(self.value):
+            self.value = value
+        else:
+            self.value = self.value + self.alpha * (value - self.value)
+
+# Running high, current drawdown and the largest drawdown so far
+class DrawdownTracker:
+    def __init__(self):
+        self.peak = math.nan
+        self.current = math.nan
+        self.maximum = 0.0
+
+    def add(self, close):
+        if math.isnan(self.peak) or close > self.peak:
+            self.peak = close
+        self.current = close / self.peak - 1.0
+        self.maximum = min(self.maximum, self.current)
+
+# RSI with Wilder's smoothing, one close at a time
+class RsiAccumulator:
+    def __init__(self, period):
+        self.period = period
+        self.previous = None
+        self.changes = 0
+        self.average_gain = 0.0
+        self.average_loss = 0.0
+
+    def add(self, close):
+        if self.previous is not None:
+            change = close - self.previous
+            gain = max(change, 0.0)
+            loss = max(-change, 0.0)
+            self.changes = self.changes + 1
+            if self.changes <= self.period:
+                # simple mean of the first period changes
+                self.average_gain = self.average_gain + (gain - self.average_gain) / self.changes
+                self.average_loss = self.average_loss + (loss - self.average_loss) / self.changes
+            else:
+                self.average_gain = self.average_gain + (gain - self.average_gain) / self.period
+                self.average_loss = self.average_loss + (loss - self.average_loss) / self.period
+        self.previous = close
+
+    @property
+    def value(self):
+        if self.changes < self.period:
+            return math.nan
+        if self.average_loss == 0.0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + self.average_gain / self.average_loss)
+
+# Latest value of every indicator for one stock, updated a day at a time.
+# Build it from existing history with from_series (vectorized), then call add() per new day.
+class IndicatorState:
+    def __init__(self, sma_window=20, ema_span=20, volatility_window=20, rsi_period=14):
+        self.price_stats = RollingStats(sma_window)
+        self.return_stats = RollingStats(volatility_window)
+        self.ema = EmaAccumulator(ema_span)
+        self.drawdown = DrawdownTracker()
+        self.rsi = RsiAccumulator(rsi_period)
+        self.traded = 0.0 # running close * volume for VWAP
+        self.shares = 0.0
+        self.close = math.nan
+        self.daily_return = math.nan
+        self.count = 0
+
+    def add(self, close, volume):
+        close = float(close)
+        volume = float(volume)
+        if self.count > 0:
+            self.daily_return = close / self.close - 1.0
+            self.return_stats.add(self.daily_return)
+        self.price_stats.add(close)
+        self.ema.add(close)
+        self.drawdown.add(close)
+        self.rsi.add(close)
+        self.traded = self.traded + close * volume
+        self.shares = self.shares + volume
+        self.close = close
+        self.count = self.count + 1
+
+    # State after the whole series, set up with the array functions above
+    @classmethod
+    def from_series(cls, series, sma_window=20, ema_span=20, volatility_window=20, rsi_period=14):
+        state = cls(sma_window, ema_span, volatility_window, rsi_period)
+        series.sort()
+        close = series.close
+        volume = series.volume
+        count = len(close)
+        if count == 0:
+            return state
+        for value in close[-sma_window:].tolist():
+            state.price_stats.add(value)
+        returns = daily_returns(close)[1:]
+        for value in returns[-volatility_window:].tolist():
+            state.return_stats.add(value)
+        state.ema.value = float(ema(close, ema_span)[-1])
+        state.drawdown.peak = float(close.max())
+        state.drawdown.current = float(close[-1] / close.max() - 1.0)
+        state.drawdown.maximum = max_drawdown(close)
+        rsi_state = state.rsi
+        rsi_state.previous = float(close[-1])
+        rsi_state.changes = count - 1
+        if count > rsi_period:
+            average_gain, average_loss = _wilder_averages(close, rsi_period)
+            rsi_state.average_gain = float(average_gain[-1])
+            rsi_state.average_loss = float(average_loss[-1])
+        elif count > 1:
+            change = np.diff(close)
+            rsi_state.average_gain = float(np.maximum(change, 0.0).mean())
+            rsi_state.average_loss = float(np.maximum(-change, 0.0).mean())
+        state.traded = float(np.dot(close, volume))
+        state.shares = float(volume.sum())
+        state.close = float(close[-1])
+        state.daily_return = float(returns[-1]) if len(returns) else math.nan
+        state.count = count
+        return state
+
+    # Latest indicator values as a dict
+    def values(self):
+        volatility = self.return_stats.variance
+        return {
+            "close": self.close,
+            "return": self.daily_return,
+            "sma": self.price_stats.mean,
+            "ema": self.ema.value,
+            "volatility": math.sqrt(volatility) * math.sqrt(TRADING_DAYS) if not math.isnan(volatility) else math.nan,
+            "vwap": self.traded / self.shares if self.shares else math.nan,
+            "drawdown": self.drawdown.current,
+            "max_drawdown": self.drawdown.maximum,
+            "rsi": self.rsi.value,
+        }
+
+def main():
+    print("This module calculates technical indicators from stock history.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Summary: This module imports many Yahoo! Finance CSV files at once (for example a nightly drop
+# of one file per symbol). Files are parsed in a process pool and merged into the database in
+# one transaction. Run it stand-alone: python batch_import.py <folder or glob> [workers]
+
+import csv
+import glob
+import os
+import re
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import stock_csv
+
+# Symbol from a file name: "aapl.csv", "AAPL_2024-06-30.csv" and "AAPL history.csv" all give AAPL
+def symbol_from_filename(filename):
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return re.split(r"[_\s]", stem.strip(), maxsplit=1)[0].upper()
+
+# CSV files in a folder, or files matching a glob pattern, in name order
+def find_csv_files(source):
+    if os.path.isdir(source):
+        source = os.path.join(source, "*.csv")
+    return sorted(path for path in glob.glob(source) if os.path.isfile(path))
+
+# Print one line per finished file
+def print_progress(done, total, filename, rows, error):
+    status = f"ERROR {error}" if error else f"{rows:,} rows"
+    print(f"[{done}/{total}] {os.path.basename(filename)}: {status}")
+
+# Import every CSV file in source (a folder or glob pattern) into the stock database.
+# Symbols not yet in the stocks table are added with 0 shares. Files are parsed in parallel
+# but written in name order, so when two files have the same day for a symbol the later
+# file wins every time.
+# progress(done, total, filename, rows, error) is called as each file is written.
+# Returns a summary dict: files, imported (files), rows and errors [(filename, message)].
+def batch_import(source, workers=None, progress=print_progress):
+    insertStockCmd = """INSERT OR IGNORE INTO stocks
+                            (symbol, name, shares)
+                            VALUES
+                            (?, ?, 0); """
+    files = find_csv_files(source)
+    summary = {"files": len(files), "imported": 0, "rows": 0, "errors": []}
+    if not files:
+        return summary
+    # Imported here rather than at the top: spawned workers re-run this module's imports
+    # when it is run stand-alone, and parsing only needs stock_csv (not selenium etc.)
+    import stock_data
+    import stock_db
+    stock_data.create_database() # creates or upgrades the schema
+    # Workers are spawned rather than forked so they don't inherit open database connections
+    with stock_db.transaction() as conn, ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(stock_csv.read_stock_columns, filename) for filename in files]
+        written = 0
+        for _ in as_completed(futures):
+            # write the files parsed so far, stopping at the first one still being parsed
+            while written < len(files) and futures[written].done():
+                filename = files[written]
+                symbol = symbol_from_filename(filename)
+                rows = 0
+                error = None
+                try:
+                    dates, close, volume = futures[written].result()
+                    if len(dates) == 0:
+                        raise ValueError("No price rows found")
+                    conn.execute(insertStockCmd, (symbol, symbol))
+                    rows = stock_data.upsert_daily_arrays(conn, symbol, dates, close, volume)
+                    summary["imported"] = summary["imported"] + 1
+                    summary["rows"] = summary["rows"] + rows
+                except (OSError, ValueError, csv.Error, BrokenProcessPool) as e:
+                    # a crashed worker fails the files not parsed yet; the ones written are kept
+                    error = str(e)
+                    summary["errors"].append((filename, error))
+                written = written + 1
+                if progress is not None:
+                    progress(written, len(files), filename, rows, error)
+    return summary
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python batch_import.py <folder or glob> [workers]")
+        return
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    summary = batch_import(sys.argv[1], workers)
+    print(f"Imported {summary['imported']} of {summary['files']} files, {summary['rows']:,} rows, {len(summary['errors'])} errors")
+
+if __name__ == "__main__":
+    main()
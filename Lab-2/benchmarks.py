@@ -0,0 +1,196 @@
+# Summary: This module contains performance benchmarks for the stock data classes and functions.
+# Run it stand-alone: python benchmarks.py [benchmark name ...]
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import numpy as np
+from stock_class import Stock, DailyData, PriceSeries, Portfolio
+import history_parser
+import analytics
+import web_fixtures
+import stock_data
+import stock_db
+import storage
+
+
+# DailyData as it was before __slots__ (per-instance __dict__), for comparison
+class DictDailyData:
+    def __init__(self, date, close, volume):
+        self._date = date
+        self._close = close
+        self._volume = volume
+
+    @property
+    def date(self):
+        return self._date
+
+    @property
+    def close(self):
+        return self._close
+
+    @property
+    def volume(self):
+        return self._volume
+
+
+# Memory allocated while building rows with make_rows(count)
+def _measure(make_rows, count):
+    tracemalloc.start()
+    rows = make_rows(count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return size
+
+# Bytes per row for 1M rows of daily data stored as dict objects, slots objects and columns.
+# Dates and floats are created inside the measurement so each layout pays for its own values.
+def benchmark_memory(count=1_000_000):
+    start = datetime(1990, 1, 1)
+    def dict_rows(n):
+        return [DictDailyData(start + timedelta(days=i), 10.0 + i, 1000.0 + i) for i in range(n)]
+    def slots_rows(n):
+        return [DailyData(start + timedelta(days=i), 10.0 + i, 1000.0 + i) for i in range(n)]
+    def series_rows(n):
+        series = PriceSeries()
+        for i in range(n):
+            series.append(start + timedelta(days=i), 10.0 + i, 1000.0 + i)
+        return series
+    print(f"Memory per row ({count:,} rows)")
+    for label, make_rows in (("DailyData with __dict__", dict_rows),
+                             ("DailyData with __slots__", slots_rows),
+                             ("PriceSeries columns", series_rows)):
+        size = _measure(make_rows, count)
+        print(f"{label:<28} {size / count:>8.1f} bytes/row  {size / 2**20:>8.1f} MB")
+
+
+# Best of repeat runs of func(), in seconds
+def _best_time(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+# History page parsing time per backend on saved fixture pages of 1, 10 and 30 years
+def benchmark_parsers(years=(1, 10, 30)):
+    print("History page parsing (best of 3)")
+    with tempfile.TemporaryDirectory() as folder:
+        for count in years:
+            filename = os.path.join(folder, f"TEST_{count}y.html")
+            rows = web_fixtures.save_history_page(filename, "TEST", count)
+            with open(filename, encoding="utf-8") as page:
+                page_source = page.read()
+            expected = history_parser.parse_history_page(page_source, "soup")
+            print(f"{count} year page - {rows:,} rows, {len(page_source) / 2**20:.1f} MB")
+            for name in history_parser.available_parsers():
+                result = history_parser.parse_history_page(page_source, name)
+                if result != expected:
+                    print(f"  {name:<6} *** results differ from soup ***")
+                    continue
+                seconds = _best_time(lambda: history_parser.parse_history_page(page_source, name))
+                print(f"  {name:<6} {seconds * 1000:>9.1f} ms  {len(result) / seconds:>12,.0f} rows/s")
+
+
+# Indicator times on a 1M row history, with pure Python loops for SMA and EMA as a reference
+def benchmark_indicators(count=1_000_000):
+    rng = np.random.default_rng(200)
+    stock = Stock("TEST", "Test Company", 100)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, count)))
+    stock.add_series(np.datetime64("1900-01-01") + np.arange(count), close, rng.integers(1000, 1000000, count))
+    def python_sma(values, window=20):
+        result = []
+        total = 0.0
+        for i, value in enumerate(values):
+            total = total + value
+            if i >= window:
+                total = total - values[i - window]
+            result.append(total / window if i >= window - 1 else None)
+        return result
+    def python_ema(values, span=20):
+        alpha = 2.0 / (span + 1.0)
+        result = [values[0]]
+        for value in values[1:]:
+            result.append((1.0 - alpha) * result[-1] + alpha * value)
+        return result
+    values = close.tolist()
+    print(f"Indicators on {count:,} rows (best of 3)")
+    for label, func in (("SMA 20 (Python loop)", lambda: python_sma(values)),
+                        ("EMA 20 (Python loop)", lambda: python_ema(values)),
+                        ("SMA 20", lambda: analytics.sma(close, 20)),
+                        ("EMA 20", lambda: analytics.ema(close, 20)),
+                        ("Daily returns", lambda: analytics.daily_returns(close)),
+                        ("Volatility 20", lambda: analytics.rolling_volatility(close, 20)),
+                        ("VWAP", lambda: analytics.vwap(close, stock.series.volume)),
+                        ("Drawdown", lambda: analytics.drawdown(close)),
+                        ("RSI 14", lambda: analytics.rsi(close, 14)),
+                        ("All (stock_indicators)", lambda: analytics.stock_indicators(stock))):
+        print(f"{label:<24} {_best_time(func) * 1000:>9.1f} ms")
+
+
+# Save and load throughput of each storage backend for stocks x days rows.
+# Each save writes every row (a new database or file); loads read them all back.
+def benchmark_storage(stocks=50, days=20_000):
+    rng = np.random.default_rng(300)
+    dates = np.datetime64("1950-01-01") + np.arange(days)
+    def portfolio():
+        stock_list = Portfolio()
+        for i in range(stocks):
+            stock = Stock(f"S{i:03}", f"Stock {i}", 100)
+            stock.add_series(dates, 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, days))), rng.integers(1000, 1000000, days))
+            stock_list.append(stock)
+        return stock_list
+    rows = stocks * days
+    print(f"Storage backends, {stocks} stocks x {days:,} days = {rows:,} rows")
+    previous = stock_data.get_storage()
+    with tempfile.TemporaryDirectory() as folder:
+        def sqlite_backend():
+            stock_db.configure(os.path.join(folder, "bench.db"))
+            stock_data.create_database()
+            return stock_data.SQLiteStorage()
+        backends = (("SQLite", sqlite_backend),
+                    ("Memory", storage.MemoryStorage),
+                    ("NumPy .npz", lambda: storage.NpzStorage(os.path.join(folder, "bench.npz"))),
+                    ("Memory-map", lambda: storage.MmapStorage(os.path.join(folder, "history"))))
+        try:
+            for label, make_backend in backends:
+                backend = make_backend()
+                stock_list = portfolio()
+                start = time.perf_counter()
+                backend.save(stock_list)
+                save_seconds = time.perf_counter() - start
+                loaded = Portfolio()
+                load_seconds = _best_time(lambda: backend.load(loaded))
+                if sum(len(stock.series) for stock in loaded) != rows:
+                    print(f"{label:<12} *** loaded row count differs ***")
+                    continue
+                print(f"{label:<12} save {save_seconds:>7.2f} s {rows / save_seconds:>12,.0f} rows/s   "
+                      f"load {load_seconds:>7.3f} s {rows / load_seconds:>12,.0f} rows/s")
+        finally:
+            stock_db.configure()
+            stock_data.set_storage(previous)
+
+
+BENCHMARKS = {
+    "memory": benchmark_memory,
+    "parsers": benchmark_parsers,
+    "indicators": benchmark_indicators,
+    "storage": benchmark_storage,
+}
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark {name}. Choose from: {', '.join(BENCHMARKS)}")
+            continue
+        BENCHMARKS[name]()
+        print()
+
+if __name__ == "__main__":
+    main()
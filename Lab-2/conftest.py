@@ -0,0 +1,15 @@
+# Summary: Shared pytest fixtures. Tests that take the database fixture get their own empty
+# stocks.db in a temporary folder and the default SQLite storage backend.
+
+import pytest
+import stock_data
+import stock_db
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "stocks.db")
+    stock_db.configure(path)
+    stock_data.set_storage(stock_data.SQLiteStorage())
+    yield path
+    stock_db.close()
+    stock_db.configure()
@@ -0,0 +1,83 @@
+# Summary: This module pulls daily price history out of Yahoo! Finance history pages.
+# Several parser backends are available; all return the same (date, close, volume) tuples.
+#   "soup" - BeautifulSoup with Python's html.parser (the original approach)
+#   "lxml" - lxml's C parser, if lxml is installed
+#   "scan" - a regular expression scan that only looks at <tr>/<td> tags
+# "auto" uses lxml when it is installed and the scanner otherwise.
+
+import re
+from datetime import datetime
+from html import unescape
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+MONTHS = {"Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
+          "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12}
+
+# Convert one 7 column row (Date, Open, High, Low, Close, Adj Close, Volume)
+# Raises ValueError for rows that are not price data
+def _history_row(cells):
+    text = cells[0].strip()
+    month = MONTHS.get(text[:3])
+    comma = text.find(",")
+    if month is None or comma < 0:
+        date_obj = datetime.strptime(text, "%b %d, %Y")
+    else:
+        date_obj = datetime(int(text[comma + 1:]), month, int(text[4:comma]))
+    close_price = float(cells[5].replace(',', ''))
+    volume = float(cells[6].replace(',', ''))
+    return (date_obj, close_price, volume)
+
+def _history_rows(rows):
+    history = []
+    for cells in rows:
+        # Standard data row has 7 columns (Date, Open, High, Low, Close, Adj Close, Volume)
+        if len(cells) == 7:
+            try:
+                history.append(_history_row(cells))
+            except ValueError:
+                continue
+    return history
+
+def parse_soup(page_source):
+    soup = BeautifulSoup(page_source, "html.parser")
+    return _history_rows([i.text for i in row.find_all('td')] for row in soup.find_all('tr'))
+
+def parse_lxml(page_source):
+    if lxml is None:
+        raise RuntimeError("lxml is not installed")
+    if not page_source.strip():
+        return []
+    root = lxml.html.fromstring(page_source)
+    return _history_rows([td.text_content() for td in row.iterfind("td")] for row in root.iter("tr"))
+
+_ROW = re.compile(r"<tr\b[^>]*>(.*?)</tr>", re.IGNORECASE | re.DOTALL)
+_CELL = re.compile(r"<td\b[^>]*>(.*?)</td>", re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r"<[^>]*>")
+
+def parse_scan(page_source):
+    def cells(row):
+        return [unescape(_TAG.sub("", cell)) for cell in _CELL.findall(row)]
+    return _history_rows(cells(row) for row in _ROW.findall(page_source))
+
+PARSERS = {
+    "soup": parse_soup,
+    "lxml": parse_lxml,
+    "scan": parse_scan,
+}
+
+# Available backend names on this system
+def available_parsers():
+    return [name for name in PARSERS if name != "lxml" or lxml is not None]
+
+# Pull (date, close, volume) tuples out of a history page with the chosen backend
+def parse_history_page(page_source, parser="auto"):
+    if parser == "auto":
+        parser = "lxml" if lxml is not None else "scan"
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown parser {parser}. Choose from: {', '.join(PARSERS)}")
+    return PARSERS[parser](page_source)
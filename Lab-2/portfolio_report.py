@@ -0,0 +1,140 @@
+# Summary: This module values the portfolio - current value, daily change, position weights
+# and portfolio value over time. The current value and positions need only each stock's last
+# two closes, so lazily loaded histories stay unloaded; value over time lines all stocks up
+# on one date x symbol price matrix. Results are cached until shares or prices change.
+
+import weakref
+import numpy as np
+
+
+# Valuation of one portfolio (Portfolio or list of Stock). Use report_for(stock_list) to
+# share one cached report per portfolio between report views.
+class PortfolioReport:
+    def __init__(self, stock_list):
+        self.stock_list = stock_list
+        self._matrix_key = None
+        self._dates = np.empty(0, dtype="datetime64[D]")
+        self._prices = np.empty((0, 0))
+        self._symbols = []
+        self._values_key = None
+        self._history_key = None
+        self._history = None
+        self._positions = None
+        self._summary = None
+
+    # Identifies the price data without reading it: each stock's series and its version
+    # (as utilities.chart_data does). Series are sorted first so sorting doesn't count as
+    # a change later. A history that is unloaded and loaded again is a new series, so the
+    # results that need it are worked out once more.
+    def _data_key(self):
+        key = []
+        for stock in self.stock_list:
+            series = stock.series
+            series.sort()
+            key.append((stock.symbol, id(series), series.version))
+        return tuple(key)
+
+    # Every date any stock traded (rows) x stocks (columns). Each stock's close is carried
+    # forward over days it has no data for; before its first day the price is NaN.
+    def price_matrix(self):
+        key = self._data_key()
+        if key != self._matrix_key:
+            series_list = [stock.series for stock in self.stock_list]
+            dates = np.unique(np.concatenate([series.dates for series in series_list])) if series_list else np.empty(0, dtype="datetime64[D]")
+            prices = np.full((len(dates), len(series_list)), np.nan)
+            for column, series in enumerate(series_list):
+                if len(series) == 0:
+                    continue
+                row = np.searchsorted(series.dates, dates, side="right") - 1
+                traded = row >= 0
+                prices[traded, column] = series.close[row[traded]]
+            self._dates = dates
+            self._prices = prices
+            self._symbols = [stock.symbol for stock in self.stock_list]
+            self._matrix_key = key
+        return self._dates, self._prices, self._symbols
+
+    # Value and positions as of the latest date any stock traded, compared with the date
+    # before it. Matches the last two rows of the price matrix: a stock's close carries
+    # forward, and counts as 0 before its first day. The second latest date of all stocks
+    # is always among some stock's last two dates, so two closes per stock are enough.
+    # Closes of unloaded lazy stocks come from the loader's cache (see LazyHistory).
+    def _calculate(self):
+        closes = [stock.latest_closes(2) for stock in self.stock_list]
+        key = tuple((stock.symbol, stock.name, stock.shares, tuple(last)) for stock, last in zip(self.stock_list, closes))
+        if key == self._values_key:
+            return
+        dates = sorted({date for last in closes for date, _ in last})
+        latest_date = dates[-1] if dates else None
+        previous_date = dates[-2] if len(dates) > 1 else latest_date
+        def close_on(last, date):
+            known = [close for day, close in last if day <= date]
+            return float(np.nan_to_num(known[-1])) if known else 0.0
+        shares = np.array([stock.shares for stock in self.stock_list], dtype=np.float64)
+        latest = np.array([close_on(last, latest_date) for last in closes], dtype=np.float64)
+        previous = np.array([close_on(last, previous_date) for last in closes], dtype=np.float64)
+        values = latest * shares
+        total = float(values.sum())
+        positions = []
+        for column, stock in enumerate(self.stock_list):
+            positions.append({
+                "symbol": stock.symbol,
+                "name": stock.name,
+                "shares": stock.shares,
+                "close": float(latest[column]),
+                "change": float(latest[column] - previous[column]),
+                "value": float(values[column]),
+                "weight": float(values[column] / total) if total else 0.0,
+            })
+        previous_total = float(previous @ shares) if len(shares) else 0.0
+        self._positions = positions
+        self._summary = {
+            "date": latest_date,
+            "value": total,
+            "previous_value": previous_total,
+            "change": total - previous_total,
+            "change_percent": (total - previous_total) / previous_total if previous_total else 0.0,
+            "positions": len(positions),
+        }
+        self._values_key = key
+
+    # Portfolio totals as of the latest date: value, change since the previous date, etc.
+    def summary(self):
+        self._calculate()
+        return self._summary
+
+    # One dict per stock: symbol, name, shares, close, change, value and weight
+    def positions(self):
+        self._calculate()
+        return self._positions
+
+    # (dates, portfolio values) using today's share counts. Needs every stock's full history.
+    def history(self):
+        key = (self._data_key(), tuple(stock.shares for stock in self.stock_list))
+        if key != self._history_key:
+            dates, prices, symbols = self.price_matrix()
+            shares = np.array([stock.shares for stock in self.stock_list], dtype=np.float64)
+            values = np.nan_to_num(prices) @ shares if len(shares) else np.zeros(len(dates))
+            self._history = (dates, values)
+            self._history_key = key
+        return self._history
+
+
+_reports = weakref.WeakKeyDictionary()
+
+# The cached PortfolioReport for a portfolio (created on first use)
+def report_for(stock_list):
+    try:
+        report = _reports.get(stock_list)
+    except TypeError: # plain lists can't be weak keys - no sharing
+        return PortfolioReport(stock_list)
+    if report is None:
+        report = PortfolioReport(weakref.proxy(stock_list))
+        _reports[stock_list] = report
+    return report
+
+def main():
+    print("This module calculates portfolio value and profit/loss.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# Summary: This module builds the text stock report and writes it out in bulk - one write per
+# page on screen, or one write to a file. Run it stand-alone to print or export the report for
+# the data in stocks.db:
+#   python report_renderer.py [--limit N] [--start m/d/yy] [--end m/d/yy] [--output FILE] [--page-size N]
+
+import argparse
+import shutil
+import sys
+from datetime import datetime
+import numpy as np
+import portfolio_report
+
+def _report_date(text):
+    try:
+        return datetime.strptime(text, "%m/%d/%y")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {text!r} - use m/d/yy")
+
+# Options shared by the command line and the console report prompt
+def option_parser():
+    parser = argparse.ArgumentParser(prog="report_renderer", description="Stock report", exit_on_error=False)
+    parser.add_argument("--limit", type=int, default=None, help="only the most recent N days for each stock")
+    parser.add_argument("--start", type=_report_date, default=None, help="first date (m/d/yy)")
+    parser.add_argument("--end", type=_report_date, default=None, help="last date (m/d/yy)")
+    parser.add_argument("--output", default=None, help="write the report to this file instead of the screen")
+    parser.add_argument("--page-size", type=int, default=None, help="lines per screen page (default: terminal height)")
+    return parser
+
+# Parse report options from a list of arguments. Raises ValueError for bad options.
+def parse_options(args):
+    try:
+        options, unknown = option_parser().parse_known_args(args)
+    except argparse.ArgumentError as e:
+        raise ValueError(str(e))
+    except SystemExit: # -h, after the help has been printed
+        raise ValueError("No report requested")
+    if unknown:
+        raise ValueError(f"Unrecognized options: {' '.join(unknown)}")
+    if options.limit is not None and options.limit < 0:
+        raise ValueError("--limit must be 0 or more")
+    return options
+
+# One stock's (ISO dates, closes, volumes) for the date window (start/end, inclusive) limited
+# to the most recent limit days. Histories that aren't in memory (lazily loaded stocks) are
+# not loaded - only the window is read from the database.
+def _report_history(stock, start=None, end=None, limit=None):
+    if not stock.series_loaded:
+        import stock_query
+        if limit is not None and start is None and end is None:
+            history = stock_query.get_latest(stock.symbol, limit)
+        else:
+            history = stock_query.get_history(stock.symbol, start, end)
+            if limit is not None:
+                history = history[len(history) - min(limit, len(history)):]
+        return ([daily_data.date.strftime("%Y-%m-%d") for daily_data in history],
+                [daily_data.close for daily_data in history],
+                [daily_data.volume for daily_data in history])
+    series = stock.series.between(start, end)
+    if limit is not None:
+        series = series[len(series) - min(limit, len(series)):]
+    return (np.datetime_as_string(series.dates, unit="D").tolist(), series.close.tolist(), series.volume.tolist())
+
+# Report text as a list of lines: portfolio summary, then each stock's history for the
+# date window (start/end, inclusive) limited to the most recent limit days
+def report_lines(stock_list, start=None, end=None, limit=None):
+    lines = ["Stock Report ---"]
+    report = portfolio_report.report_for(stock_list)
+    summary = report.summary()
+    if summary["date"] is not None:
+        lines.append(f"Portfolio Value as of {summary['date'].strftime('%m/%d/%y')}: ${summary['value']:,.2f}  "
+                     f"Daily Change: ${summary['change']:,.2f} ({summary['change_percent']:.2%})")
+        lines.append(f"{'Symbol':<10} {'Shares':>10} {'Close':>12} {'Value':>15} {'Weight':>8}")
+        for position in report.positions():
+            close = "$" + format(position["close"], ",.2f")
+            value = "$" + format(position["value"], ",.2f")
+            lines.append(f"{position['symbol']:<10} {position['shares']:>10} {close:>12} {value:>15} {position['weight']:>8.1%}")
+        lines.append("-" * 20)
+    for stock in stock_list:
+        lines.append(f"Report for: {stock.symbol} - {stock.name}")
+        lines.append(f"Shares: {stock.shares}")
+        lines.append(f"{'Date':<15} {'Price':<15} {'Volume':<15}")
+        # ISO dates rearranged to m/d/y without strftime per row
+        for day, close, volume in zip(*_report_history(stock, start, end, limit)):
+            lines.append(f"{day[5:7] + '/' + day[8:10] + '/' + day[2:4]:<15} ${close:<14.2f} {volume:<15}")
+        lines.append("-" * 20)
+    return lines
+
+# Split lines into pages of text
+def paginate(lines, page_size):
+    page_size = max(1, page_size)
+    return ["\n".join(lines[i:i + page_size]) + "\n" for i in range(0, len(lines), page_size)]
+
+# Show the report one page at a time, with a single write per page.
+# prompt is called between pages; answering Q stops.
+def page_report(lines, page_size=None, out=sys.stdout, prompt=input):
+    if page_size is None:
+        page_size = shutil.get_terminal_size().lines - 2
+    pages = paginate(lines, page_size)
+    for number, page in enumerate(pages, start=1):
+        out.write(page)
+        out.flush()
+        if number < len(pages):
+            answer = prompt(f"-- Page {number} of {len(pages)} - Enter for more, Q to stop -- ")
+            if answer.strip().upper() == "Q":
+                break
+
+# Write the whole report to a file in one write
+def export_report(lines, filename):
+    with open(filename, "w", encoding="utf-8") as report:
+        report.write("\n".join(lines) + "\n")
+
+def main():
+    import stock_data
+    import stock_db
+    from stock_class import Portfolio
+    try:
+        options = parse_options(sys.argv[1:])
+    except ValueError as e:
+        print(e)
+        return
+    if not stock_db.database_exists():
+        print(f"No stock database at {stock_db.database_path()}")
+        return
+    stock_data.upgrade_database()
+    stock_list = Portfolio()
+    stock_data.load_stock_data(stock_list, lazy=True) # each stock's window is read by report_lines
+    lines = report_lines(stock_list, options.start, options.end, options.limit)
+    if options.output:
+        export_report(lines, options.output)
+        print(f"Report written to {options.output}")
+    elif sys.stdout.isatty():
+        page_report(lines, options.page_size)
+    else:
+        sys.stdout.write("\n".join(lines) + "\n")
+
+if __name__ == "__main__":
+    main()
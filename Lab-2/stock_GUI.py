@@ -7,15 +7,86 @@ from tkinter import ttk
 from tkinter import messagebox, simpledialog, filedialog
 import csv
 import stock_data
-from stock_class import Stock, DailyData
+import stock_db
+import batch_import
+import web_cache
+import portfolio_report
+from task_runner import TaskRunner, TaskCancelled
+from stock_class import Stock, DailyData, Portfolio
 from utilities import clear_screen, display_stock_chart, sortStocks, sortDailyData
 
+# Price history table that only fills the rows on screen. The Treeview holds a fixed
+# set of row items; scrolling moves a window over the stock's series and rewrites those
+# rows, so showing a stock takes the same time however much history it has.
+class HistoryView:
+    def __init__(self, parent, rows=15):
+        self.rows = rows
+        self.series = None
+        self.offset = 0
+        self.tree = ttk.Treeview(parent, columns=("date", "price", "volume"), show="headings", height=rows, selectmode="none")
+        self.tree.heading("date", text="Date")
+        self.tree.heading("price", text="Price")
+        self.tree.heading("volume", text="Volume")
+        self.tree.column("date", width=80, anchor=W)
+        self.tree.column("price", width=100, anchor=E)
+        self.tree.column("volume", width=110, anchor=E)
+        self.scrollbar = ttk.Scrollbar(parent, orient=VERTICAL, command=self.scroll)
+        self.items = [self.tree.insert("", END, values=("", "", "")) for i in range(rows)]
+        self.tree.bind("<MouseWheel>", lambda evt: self.scroll("scroll", -1 if evt.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda evt: self.scroll("scroll", -1, "units"))
+        self.tree.bind("<Button-5>", lambda evt: self.scroll("scroll", 1, "units"))
+
+    def grid(self, column, row):
+        self.tree.grid(column=column, row=row, sticky=NS)
+        self.scrollbar.grid(column=column + 1, row=row, sticky=NS)
+
+    # Show a stock's series (or None to clear) from the first day
+    def show(self, series):
+        self.series = series
+        self.offset = 0
+        if series is not None:
+            series.sort()
+        self.refresh()
+
+    # Scrollbar and mouse wheel commands: ("moveto", fraction) or ("scroll", count, "units"/"pages")
+    def scroll(self, action, amount, unit=None):
+        count = len(self.series) if self.series is not None else 0
+        if action == "moveto":
+            self.offset = int(float(amount) * count)
+        elif unit == "pages":
+            self.offset = self.offset + int(amount) * self.rows
+        else:
+            self.offset = self.offset + int(amount)
+        self.refresh()
+
+    # Rewrite the visible rows from the current offset
+    def refresh(self):
+        count = len(self.series) if self.series is not None else 0
+        self.offset = max(0, min(self.offset, count - self.rows))
+        visible = self.series[self.offset:self.offset + self.rows].to_daily_data() if count else []
+        for i, item in enumerate(self.items):
+            if i < len(visible):
+                daily_data = visible[i]
+                self.tree.item(item, values=(daily_data.date.strftime("%m/%d/%y"), '${:0,.2f}'.format(daily_data.close), str(daily_data.volume)))
+            else:
+                self.tree.item(item, values=("", "", ""))
+        if count > self.rows:
+            self.scrollbar.set(self.offset / count, (self.offset + self.rows) / count)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+
 class StockApp:
     def __init__(self):
-        self.stock_list = []
+        self.stock_list = Portfolio()
+        self.tasks = TaskRunner()
+        self.web_cache = web_cache.HistoryCache()
+        self.polling = False
         #check for database, create if not exists
-        if path.exists("stocks.db") == False:
+        if stock_db.database_exists() == False:
             stock_data.create_database()
+        else:
+            stock_data.upgrade_database()
 
         # This section creates the user interface
 
@@ -38,6 +109,7 @@ class StockApp:
         self.webmenu = Menu(self.menubar, tearoff=0)
         self.webmenu.add_command(label="Scrape Data from Yahoo! Finance...", command=self.scrape_web_data)
         self.webmenu.add_command(label="Import CSV from Yahoo! Finance...", command=self.importCSV_web_data)
+        self.webmenu.add_command(label="Batch Import CSV Folder...", command=self.batch_import_csv)
         self.menubar.add_cascade(label="Web", menu=self.webmenu)
 
         # Add Chart Menu
@@ -103,31 +175,94 @@ class StockApp:
         self.sellButton.grid(column=1, row=6)
 
         # Setup History Tab
-        self.dailyDataList = Text(self.historyTab, width=40, height=15)
+        self.dailyDataList = HistoryView(self.historyTab, rows=15)
         self.dailyDataList.grid(column=0, row=0)
         
         # Setup Report Tab
         self.stockReport = Text(self.reportTab, width=40, height=15)
         self.stockReport.grid(column=0, row=0)
 
+        # Add status bar for background tasks
+        self.statusLabel = Label(self.root, text="Ready", anchor=W)
+        self.statusLabel.grid(column=0, row=3, columnspan=2, sticky=EW, padx=5)
+        self.cancelButton = Button(self.root, text="Cancel", command=self.tasks.cancel, state=DISABLED)
+        self.cancelButton.grid(column=2, row=3, padx=5, pady=5)
+
         ## Call MainLoop
         self.root.mainloop()
 
 # This section provides the functionality
        
-    # Load stocks and history from database.
-    def load(self):
+    # Run function(task, *args) on the worker thread (see task_runner), showing its
+    # progress in the status bar. Returns False if another task is still running.
+    def run_task(self, name, function, *args, progress=None, done=None, cancellable=True):
+        if self.tasks.busy:
+            messagebox.showwarning(name, "Please wait - " + self.tasks.current.name + " is still running")
+            return False
+        self.tasks.start(name, function, *args, progress=progress, done=done, error=lambda e: self.task_failed(name, e))
+        self.statusLabel['text'] = name + "..."
+        self.cancelButton['state'] = NORMAL if cancellable else DISABLED
+        if not self.polling:
+            self.polling = True
+            self.root.after(100, self.poll_tasks)
+        return True
+
+    # Deliver task progress and results on the main loop until the task finishes
+    def poll_tasks(self):
+        if self.tasks.poll():
+            self.root.after(100, self.poll_tasks)
+        else:
+            self.polling = False
+            self.cancelButton['state'] = DISABLED
+            if self.statusLabel['text'].endswith("..."):
+                self.statusLabel['text'] = "Ready"
+
+    def task_failed(self, name, error):
+        if isinstance(error, TaskCancelled):
+            self.statusLabel['text'] = name + " cancelled"
+        else:
+            self.statusLabel['text'] = name + " failed"
+            messagebox.showerror(name, str(error))
+
+    # Changes to the stock list wait until a background task finishes
+    def check_busy(self):
+        if self.tasks.busy:
+            messagebox.showwarning("Busy", "Please wait - " + self.tasks.current.name + " is still running")
+        return self.tasks.busy
+
+    # Load stocks and history from database in the background.
+    # Stocks are added to the list as each one finishes loading.
+    def load(self, message="Data Loaded"):
+        if self.check_busy():
+            return
         self.stockList.delete(0,END)
-        stock_data.load_stock_data(self.stock_list)
-        sortStocks(self.stock_list)
-        for stock in self.stock_list:
+        self.dailyDataList.show(None)
+        self.stock_list.clear()
+        def loaded(stock):
+            self.stock_list.append(stock)
             self.stockList.insert(END,stock.symbol)
-        messagebox.showinfo("Load Data","Data Loaded")
+            self.statusLabel['text'] = "Loading... " + str(len(self.stock_list)) + " stocks"
+        def finished(result):
+            sortStocks(self.stock_list)
+            self.statusLabel['text'] = "Loaded " + str(len(self.stock_list)) + " stocks"
+            messagebox.showinfo("Load Data",message)
+        self.run_task("Load Data", lambda task: stock_data.load_stock_data(Portfolio(), task.progress, lazy=True), progress=loaded, done=finished)
 
-    # Save stocks and history to database.
+    # Save stocks and history to database in the background.
+    # The save is one transaction, so it cannot be cancelled part way.
     def save(self):
-        stock_data.save_stock_data(self.stock_list)
-        messagebox.showinfo("Save Data","Data Saved")
+        def finished(summary):
+            message = "Data Saved\nInserted: " + str(summary["inserted"]) + "\nUpdated: " + str(summary["updated"]) + "\nSkipped: " + str(summary["skipped"])
+            if summary["errors"]:
+                message = message + "\nErrors: " + str(len(summary["errors"]))
+            self.statusLabel['text'] = "Data Saved"
+            messagebox.showinfo("Save Data",message)
+        self.run_task("Save Data", lambda task: stock_data.save_stock_data(self.stock_list), done=finished, cancellable=False)
+
+    # Symbol selected in the stock list, or None
+    def selected_symbol(self):
+        selection = self.stockList.curselection()
+        return self.stockList.get(selection[0]) if selection else None
 
     # Refresh history and report tabs
     def update_data(self, evt):
@@ -137,22 +272,47 @@ class StockApp:
     def display_stock_data(self):
         try:
             symbol = self.stockList.get(self.stockList.curselection())
-            for stock in self.stock_list:
-                if stock.symbol == symbol:
-                    self.headingLabel['text'] = stock.name + " - " + str(stock.shares) + " Shares"
-                    self.dailyDataList.delete("1.0",END)
-                    self.stockReport.delete("1.0",END)
-                    self.dailyDataList.insert(END,"- Date -   - Price -   - Volume -\n")
-                    self.dailyDataList.insert(END,"=================================\n")
-                    for daily_data in stock.DataList:
-                        row = daily_data.date.strftime("%m/%d/%y") + "   " +  '${:0,.2f}'.format(daily_data.close) + "   " + str(daily_data.volume) + "\n"
-                        self.dailyDataList.insert(END,row)
+            stock = self.stock_list.get(symbol)
+            if stock is not None:
+                self.headingLabel['text'] = stock.name + " - " + str(stock.shares) + " Shares"
+                self.dailyDataList.show(stock.series)
+                self.display_stock_report(stock)
         except TclError:
             pass # No selection
 
+    # Show the latest indicator values (kept up to date by the stock as data is added).
+    def display_stock_report(self, stock):
+        self.stockReport.delete("1.0",END)
+        if len(stock.series) == 0:
+            self.stockReport.insert(END,"No daily data\n")
+            return
+        values = stock.indicators.values()
+        report = [("Close", '${:0,.2f}'.format(values["close"])),
+                  ("Daily Change", '{:.2%}'.format(values["return"])),
+                  ("20 Day SMA", '${:0,.2f}'.format(values["sma"])),
+                  ("20 Day EMA", '${:0,.2f}'.format(values["ema"])),
+                  ("VWAP", '${:0,.2f}'.format(values["vwap"])),
+                  ("Volatility (20 Day)", '{:.2%}'.format(values["volatility"])),
+                  ("RSI (14 Day)", '{:.1f}'.format(values["rsi"])),
+                  ("Drawdown", '{:.2%}'.format(values["drawdown"])),
+                  ("Max Drawdown", '{:.2%}'.format(values["max_drawdown"]))]
+        for label, value in report:
+            self.stockReport.insert(END,'{:<22}{:>14}\n'.format(label, value))
+        summary = portfolio_report.report_for(self.stock_list).summary()
+        position = next(p for p in portfolio_report.report_for(self.stock_list).positions() if p["symbol"] == stock.symbol)
+        self.stockReport.insert(END,"\n")
+        self.stockReport.insert(END,'{:<22}{:>14}\n'.format("Position Value", '${:0,.2f}'.format(position["value"])))
+        self.stockReport.insert(END,'{:<22}{:>14}\n'.format("Portfolio Weight", '{:.1%}'.format(position["weight"])))
+        self.stockReport.insert(END,'{:<22}{:>14}\n'.format("Portfolio Value", '${:0,.2f}'.format(summary["value"])))
+        self.stockReport.insert(END,'{:<22}{:>14}\n'.format("Portfolio Change", '${:0,.2f}'.format(summary["change"])))
     
     # Add new stock to track.
     def add_stock(self):
+        if self.check_busy():
+            return
+        if self.addSymbolEntry.get() in self.stock_list:
+            messagebox.showerror("Error", self.addSymbolEntry.get() + " is already being tracked")
+            return
         try:
             new_stock = Stock(self.addSymbolEntry.get(),self.addNameEntry.get(),float(str(self.addSharesEntry.get())))
             self.stock_list.append(new_stock)
@@ -165,12 +325,14 @@ class StockApp:
 
     # Buy shares of stock.
     def buy_shares(self):
+        if self.check_busy():
+            return
         try:
             symbol = self.stockList.get(self.stockList.curselection())
-            for stock in self.stock_list:
-                if stock.symbol == symbol:
-                    stock.buy(float(self.updateSharesEntry.get()))
-                    self.headingLabel['text'] = stock.name + " - " + str(stock.shares) + " Shares"
+            stock = self.stock_list.get(symbol)
+            if stock is not None:
+                stock.buy(float(self.updateSharesEntry.get()))
+                self.headingLabel['text'] = stock.name + " - " + str(stock.shares) + " Shares"
             messagebox.showinfo("Buy Shares","Shares Purchased")
             self.updateSharesEntry.delete(0,END)
         except:
@@ -178,12 +340,14 @@ class StockApp:
 
     # Sell shares of stock.
     def sell_shares(self):
+        if self.check_busy():
+            return
         try:
             symbol = self.stockList.get(self.stockList.curselection())
-            for stock in self.stock_list:
-                if stock.symbol == symbol:
-                    stock.sell(float(self.updateSharesEntry.get()))
-                    self.headingLabel['text'] = stock.name + " - " + str(stock.shares) + " Shares"
+            stock = self.stock_list.get(symbol)
+            if stock is not None:
+                stock.sell(float(self.updateSharesEntry.get()))
+                self.headingLabel['text'] = stock.name + " - " + str(stock.shares) + " Shares"
             messagebox.showinfo("Sell Shares","Shares Sold")
             self.updateSharesEntry.delete(0,END)
         except:
@@ -191,13 +355,14 @@ class StockApp:
 
     # Remove stock and all history from being tracked.
     def delete_stock(self):
+        if self.check_busy():
+            return
         try:
             symbol = self.stockList.get(self.stockList.curselection())
             idx = self.stockList.curselection()[0]
-            for i, stock in enumerate(self.stock_list):
-                if stock.symbol == symbol:
-                    del self.stock_list[i]
+            self.stock_list.remove(symbol)
             self.stockList.delete(idx)
+            self.dailyDataList.show(None)
             messagebox.showinfo("Deleted", "Stock Deleted")
         except:
              messagebox.showerror("Error", "Select a stock to delete")
@@ -209,13 +374,48 @@ class StockApp:
         
         if not dateFrom or not dateTo:
             return 
+        if self.check_busy():
+            return
+        symbols = [stock.symbol for stock in self.stock_list]
+        starts = None
+        if messagebox.askyesno("Get Data From Web", "Only get the days after each stock's last stored day?"):
+            try:
+                starts = stock_data.gap_start_dates(dateFrom, dateTo, self.stock_list)
+            except ValueError:
+                messagebox.showerror("Get Data From Web", "Invalid Date Format. Please use m/d/yy")
+                return
+            symbols = [symbol for symbol in symbols if symbol in starts]
             
-        try:
-            stock_data.retrieve_stock_web(dateFrom, dateTo, self.stock_list)
-            self.display_stock_data()
-            messagebox.showinfo("Get Data From Web", "Data Retrieved")
-        except Exception as e:
-            messagebox.showerror("Cannot Get Data from Web", f"Check Path for Chrome Driver. Error: {e}")
+        # Pages are fetched on the worker thread (or read from the web cache) and merged here as each arrives
+        # Symbols that could not be retrieved come back as (symbol, message)
+        def fetch(task, symbols):
+            errors = []
+            pages = stock_data.fetch_stock_history(dateFrom, dateTo, symbols, cache=self.web_cache, starts=starts, errors=errors)
+            try:
+                for page in pages:
+                    task.progress(page)
+            finally:
+                pages.close()
+            return errors
+        retrieved = {"stocks": 0, "days": 0}
+        def page_retrieved(page):
+            symbol, dates, closes, volumes = page
+            stock = self.stock_list.get(symbol)
+            if stock is not None:
+                stock.add_series(dates, closes, volumes)
+                retrieved["stocks"] = retrieved["stocks"] + 1
+                retrieved["days"] = retrieved["days"] + len(dates)
+                self.statusLabel['text'] = "Retrieving... " + str(retrieved["stocks"]) + " of " + str(len(symbols)) + " stocks"
+                if self.selected_symbol() == symbol:
+                    self.display_stock_data()
+        def finished(errors):
+            self.statusLabel['text'] = "Retrieved " + str(retrieved["days"]) + " days"
+            if errors:
+                failed = "\n".join(symbol + ": " + message for symbol, message in errors)
+                messagebox.showwarning("Get Data From Web", "Data Retrieved for " + str(retrieved["stocks"]) + " of " + str(len(symbols)) + " stocks\nNot Retrieved:\n" + failed)
+            else:
+                messagebox.showinfo("Get Data From Web", "Data Retrieved")
+        self.run_task("Get Data From Web", fetch, symbols, progress=page_retrieved, done=finished)
 
     # [cite_start]Import CSV stock history file. [cite: 258-272]
     def importCSV_web_data(self):
@@ -231,13 +431,47 @@ class StockApp:
         )
         
         if filename != "":
-            try:
-                stock_data.import_stock_web_csv(self.stock_list, symbol, filename)
-                self.display_stock_data()
+            # The file is read on the worker thread and merged here a chunk at a time
+            def read(task):
+                for chunk in stock_data.read_stock_csv(filename):
+                    task.progress(chunk)
+            imported = {"days": 0}
+            def chunk_read(chunk):
+                stock = self.stock_list.get(symbol)
+                if stock is not None:
+                    stock.add_series(*chunk)
+                    imported["days"] = imported["days"] + len(chunk[0])
+                    self.statusLabel['text'] = "Importing " + symbol + "... " + str(imported["days"]) + " days"
+            def finished(result):
+                self.statusLabel['text'] = "Imported " + str(imported["days"]) + " days"
+                if self.selected_symbol() == symbol:
+                    self.display_stock_data()
                 messagebox.showinfo("Import Complete", symbol + " Import Complete")
-            except Exception as e:
-                messagebox.showerror("Import Failed", str(e))
+            self.run_task("Import CSV", read, progress=chunk_read, done=finished)
     
+    # Import a folder of CSV files (one per symbol) into the database, then reload.
+    def batch_import_csv(self):
+        folder = filedialog.askdirectory(title="Select Folder of Yahoo Finance! CSV Files")
+        if not folder:
+            return
+        if self.check_busy():
+            return
+        save_first = messagebox.askyesno("Batch Import", "Save current data first? Unsaved changes are lost when the imported data is loaded.")
+        def run(task):
+            if save_first:
+                stock_data.save_stock_data(self.stock_list)
+            return batch_import.batch_import(folder, progress=lambda done, total, filename, rows, error: task.progress((done, total, filename)))
+        def file_done(status):
+            done, total, filename = status
+            self.statusLabel['text'] = "Importing... " + str(done) + " of " + str(total) + " files (" + path.basename(filename) + ")"
+        # Reload the database once the files are imported
+        def finished(summary):
+            message = "Imported " + str(summary["imported"]) + " of " + str(summary["files"]) + " files\n" + str(summary["rows"]) + " rows"
+            for filename, error in summary["errors"][:10]:
+                message = message + "\n" + path.basename(filename) + ": " + error
+            self.load(message)
+        self.run_task("Batch Import", run, progress=file_done, done=finished)
+
     # Display stock price chart.
     def display_chart(self):
         try:
@@ -1,14 +1,37 @@
 # Summary: This module contains the class definitions that will be used in the stock analysis program
 
 from datetime import datetime
+import numpy as np
+from analytics import IndicatorState
+
+
+# Key for a date in the change tracking. Callers pass datetime, date or np.datetime64
+# values, which don't compare equal to each other, so they're all reduced to one type.
+def _day(date):
+    return np.datetime64(date, "D")
 
 
 class Stock:
+    __slots__ = ("_symbol", "_name", "_shares", "_series", "_loader", "_data_view", "_tracked",
+                 "_stock_changed", "_new_data", "_new_batches", "_modified_data", "_deleted_dates",
+                 "_indicators")
+
     def __init__(self, symbol, name, shares):
         self._symbol = symbol
         self._name = name
         self._shares = shares
-        self.DataList = [] # list of daily stock data
+        self._series = PriceSeries() # daily stock data stored as columns
+        self._loader = None # fetches the series on first use when loaded lazily
+        self._data_view = DailyDataList(self) # DataList - DailyData view of the series
+        # Change tracking so saves only write what changed since the last load/save
+        self._tracked = False # True once the stock matches the database
+        self._stock_changed = True
+        self._new_data = {} # date -> DailyData added since last load/save
+        self._new_batches = [] # PriceSeries added with add_series since last load/save
+        self._modified_data = {} # date -> DailyData changed since last load/save
+        self._deleted_dates = set()
+        # (the change tracking dicts and set are keyed by np.datetime64 day, see _day)
+        self._indicators = None # IndicatorState, built on first use
 
     @property
     def symbol(self):
@@ -23,6 +46,7 @@ class Stock:
     @name.setter
     def name(self,name):
         self._name = name
+        self._stock_changed = True
     
     @property
     def shares(self):
@@ -31,18 +55,270 @@ class Stock:
     def shares(self,shares):
         raise RuntimeWarning("Use buy() or sell() to change shares.")
 
+    # Daily stock data as columns (PriceSeries). A lazily loaded stock fetches
+    # its history through its loader the first time it is used.
+    @property
+    def series(self):
+        if self._series is None:
+            self._series = self._loader.load(self)
+        elif self._loader is not None:
+            self._loader.touch(self)
+        return self._series
+    @series.setter
+    def series(self, series):
+        self._series = series
+
+    # Load the history on first use from loader.load(stock) -> PriceSeries.
+    # loader.touch(stock) is called each time the loaded history is used.
+    # The loader also provides latest_closes(stock, n) (see latest_closes below).
+    def set_series_loader(self, loader):
+        self._loader = loader
+        self._series = None
+        self._indicators = None
+
+    # True unless the stock is lazily loaded and its history isn't in memory
+    @property
+    def series_loaded(self):
+        return self._series is not None
+
+    # The last n (date, close) pairs, oldest first, as datetime.date and float.
+    # A lazily loaded stock whose history isn't in memory gets them from
+    # loader.latest_closes(stock, n) instead of loading the whole history.
+    def latest_closes(self, n=1):
+        if self._series is None:
+            return self._loader.latest_closes(self, n)
+        series = self._series
+        series.sort()
+        start = max(len(series) - n, 0)
+        return list(zip(series.dates[start:].tolist(), series.close[start:].tolist()))
+
+    # Drop a lazily loaded history from memory (it is fetched again on next use).
+    # Histories with unsaved changes are kept. Returns True if it was dropped.
+    def unload_series(self):
+        if self._loader is None or self._series is None or not self._tracked:
+            return False
+        if self._new_data or self._new_batches or self._modified_data or self._deleted_dates:
+            return False
+        self._series = None
+        self._indicators = None
+        return True
+
+    # Daily stock data as a list of DailyData (a view of self.series)
+    @property
+    def DataList(self):
+        return self._data_view
+    @DataList.setter
+    def DataList(self, data_list):
+        self.series = PriceSeries.from_daily_data(data_list)
+        self._tracked = False # history replaced - write everything on the next save
+        self._indicators = None
+
     def buy(self, shares):
         self._shares = self._shares + shares
+        self._stock_changed = True
 
     def sell(self, shares):
        self._shares = self._shares - shares
+       self._stock_changed = True
        
-    # Add daily stock data
+    # Add daily stock data. A date that is already in the history is replaced,
+    # so the history stays sorted with one row per date.
     def add_data(self, stock_data):
-        self.DataList.append(stock_data)
+        last = self.series.dates[-1] if len(self.series) else None
+        self.series.upsert(stock_data.date, stock_data.close, stock_data.volume)
+        if last is None or self.series.dates[-1] > last:
+            self._feed_indicators(1)
+        else:
+            self._indicators = None
+        day = _day(stock_data.date)
+        if day in self._deleted_dates:
+            self._deleted_dates.discard(day)
+            self._modified_data[day] = stock_data
+        elif day in self._modified_data:
+            self._modified_data[day] = stock_data
+        else:
+            self._new_data[day] = stock_data
+
+    # Add many days at once from date, close and volume arrays, merged by date
+    # like add_data. Returns (days added, days replaced).
+    def add_series(self, dates, close, volume):
+        batch = PriceSeries.from_arrays(dates, close, volume)
+        if len(batch) == 0:
+            return (0, 0)
+        last = self.series.dates[-1] if len(self.series) else None
+        counts = self.series.merge(batch.dates, batch.close, batch.volume)
+        if counts[1] == 0 and (last is None or batch.dates.min() > last):
+            self._feed_indicators(counts[0])
+        else:
+            self._indicators = None
+        if not self._tracked:
+            return counts
+        self._new_batches.append(batch)
+        if self._deleted_dates:
+            # re-added dates are rewritten by the save instead of deleted
+            days = set(batch.dates.tolist())
+            self._deleted_dates = {day for day in self._deleted_dates if day.item() not in days}
+        return counts
+
+    # Change price and volume for a date (use this instead of the DailyData setters so the change is saved)
+    def update_data(self, date, close, volume):
+        index = self.series.index_of(date)
+        if index < 0:
+            return False
+        self.series.set(index, close, volume)
+        self._indicators = None
+        day = _day(date)
+        if day in self._new_data:
+            self._new_data[day] = DailyData(date, close, volume)
+        else:
+            self._modified_data[day] = DailyData(date, close, volume)
+        return True
+
+    # Remove daily stock data for a date
+    def remove_data(self, date):
+        if self.series.remove(date) == 0:
+            return False
+        self._indicators = None
+        day = _day(date)
+        for batch in self._new_batches:
+            batch.remove(day)
+        self._modified_data.pop(day, None)
+        if self._new_data.pop(day, None) is None:
+            self._deleted_dates.add(day)
+        return True
+
+    # Update cached indicators with the last count days of the series (just appended).
+    # Large batches are cheaper to recalculate with the vectorized functions on next use.
+    def _feed_indicators(self, count):
+        if self._indicators is None:
+            return
+        if count > 256:
+            self._indicators = None
+            return
+        for close, volume in zip(self.series.close[-count:].tolist(), self.series.volume[-count:].tolist()):
+            self._indicators.add(close, volume)
+
+    # Latest indicator values (analytics.IndicatorState). Built from the history on first
+    # use, then each day added after the last date updates it in O(1).
+    @property
+    def indicators(self):
+        if self._indicators is None or self._indicators.count != len(self.series):
+            self._indicators = IndicatorState.from_series(self.series)
+        return self._indicators
+
+    # True once the stock has been loaded from or saved to the database
+    @property
+    def is_tracked(self):
+        return self._tracked
+
+    # True if name or shares changed since the last load/save
+    @property
+    def stock_changed(self):
+        return self._stock_changed or not self._tracked
+
+    # True if anything needs to be written on the next save
+    @property
+    def has_changes(self):
+        return self.stock_changed or bool(self._new_data or self._new_batches or self._modified_data or self._deleted_dates)
+
+    # Daily data added or changed since the last load/save (all data if never saved)
+    # as (ISO date, close, volume) tuples, built from columns
+    def changed_rows(self):
+        if not self._tracked:
+            batches = [self.series]
+        else:
+            batches = [PriceSeries.from_daily_data(self._new_data.values())] + self._new_batches + [PriceSeries.from_daily_data(self._modified_data.values())]
+        rows = []
+        for batch in batches:
+            rows.extend(zip(np.datetime_as_string(batch.dates, unit="D").tolist(), batch.close.tolist(), batch.volume.tolist()))
+        return rows
+
+    # Number of rows changed_rows would return
+    def changed_count(self):
+        if not self._tracked:
+            return len(self.series)
+        return len(self._new_data) + sum(len(batch) for batch in self._new_batches) + len(self._modified_data)
+
+    # Dates removed since the last load/save (np.datetime64 days)
+    def deleted_dates(self):
+        return list(self._deleted_dates)
+
+    # Called after a load or successful save - the stock now matches the database
+    def mark_clean(self):
+        self._tracked = True
+        self._stock_changed = False
+        self._new_data.clear()
+        self._new_batches.clear()
+        self._modified_data.clear()
+        self._deleted_dates.clear()
     
 
+# The stocks being tracked. Keeps the stocks in order plus a symbol -> Stock dict,
+# so finding a stock by symbol is O(1). Supports the list operations the program
+# uses (append, iteration, len, indexing, del, clear, sort).
+class Portfolio:
+    def __init__(self, stocks=()):
+        self._stocks = []
+        self._index = {}
+        for stock in stocks:
+            self.append(stock)
+
+    def __len__(self):
+        return len(self._stocks)
+
+    def __iter__(self):
+        return iter(self._stocks)
+
+    def __getitem__(self, index):
+        return self._stocks[index]
+
+    def __delitem__(self, index):
+        for stock in (self._stocks[index] if isinstance(index, slice) else [self._stocks[index]]):
+            del self._index[stock.symbol]
+        del self._stocks[index]
+
+    # "AAPL" in portfolio
+    def __contains__(self, symbol):
+        return symbol in self._index
+
+    def __repr__(self):
+        return f"<Portfolio {' '.join(self._index)}>"
+
+    # Stock for a symbol, or default if it is not being tracked
+    def get(self, symbol, default=None):
+        return self._index.get(symbol, default)
+
+    def symbols(self):
+        return [stock.symbol for stock in self._stocks]
+
+    # Add a stock; each symbol can only be added once
+    def append(self, stock):
+        if stock.symbol in self._index:
+            raise ValueError(f"{stock.symbol} is already in the portfolio")
+        self._stocks.append(stock)
+        self._index[stock.symbol] = stock
+
+    # Remove and return the stock for a symbol (None if not found)
+    def remove(self, symbol):
+        stock = self._index.pop(symbol, None)
+        if stock is not None:
+            self._stocks.remove(stock)
+        return stock
+
+    def clear(self):
+        self._stocks.clear()
+        self._index.clear()
+
+    # Sort by symbol, or by key like list.sort
+    def sort(self, key=None, reverse=False):
+        self._stocks.sort(key=key if key is not None else (lambda x: x.symbol), reverse=reverse)
+
+
+# One day of price and volume data.
+# __slots__ keeps each record to three fields with no per-instance __dict__.
 class DailyData:
+    __slots__ = ("_date", "_close", "_volume")
+
     def __init__(self, date, close, volume):
         self._date = date
         self._close = close
@@ -70,6 +346,266 @@ class DailyData:
         self._volume = volume
 
 
+# Daily closing prices and volumes stored as contiguous NumPy columns.
+# Appends grow the arrays by doubling, so adding a day is amortized O(1).
+class PriceSeries:
+    def __init__(self, capacity=0):
+        self._dates = np.empty(capacity, dtype="datetime64[D]")
+        self._close = np.empty(capacity, dtype=np.float64)
+        self._volume = np.empty(capacity, dtype=np.float64)
+        self._size = 0
+        self._sorted = True # dates are in ascending order
+        self.version = 0 # changes whenever the data changes, so callers can cache results
+
+    # Build a series around existing arrays (no copy when the dtypes already match).
+    # Pass is_sorted when the order is already known, to skip checking every date
+    # (e.g. memory-mapped files, which would otherwise all be read in).
+    @classmethod
+    def from_arrays(cls, dates, close, volume, is_sorted=None):
+        series = cls()
+        series._dates = np.asarray(dates, dtype="datetime64[D]")
+        series._close = np.asarray(close, dtype=np.float64)
+        series._volume = np.asarray(volume, dtype=np.float64)
+        if not (len(series._dates) == len(series._close) == len(series._volume)):
+            raise ValueError("Dates, close and volume must be the same length")
+        series._size = len(series._dates)
+        if is_sorted is None:
+            is_sorted = bool(np.all(series._dates[1:] >= series._dates[:-1]))
+        series._sorted = is_sorted
+        return series
+
+    @classmethod
+    def from_daily_data(cls, data_list):
+        series = cls()
+        for daily_data in data_list:
+            series.append(daily_data.date, daily_data.close, daily_data.volume)
+        return series
+
+    def __len__(self):
+        return self._size
+
+    # Date, close and volume arrays (views - no copy)
+    @property
+    def dates(self):
+        return self._dates[:self._size]
+
+    @property
+    def close(self):
+        return self._close[:self._size]
+
+    @property
+    def volume(self):
+        return self._volume[:self._size]
+
+    @property
+    def is_sorted(self):
+        return self._sorted
+
+    def _reserve(self, size):
+        if size <= len(self._dates):
+            return
+        capacity = max(size, 2 * len(self._dates), 16)
+        for attr in ("_dates", "_close", "_volume"):
+            old = getattr(self, attr)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, attr, new)
+
+    def append(self, date, close, volume):
+        date = np.datetime64(date, "D")
+        close = float(close)
+        volume = float(volume)
+        self._reserve(self._size + 1)
+        if self._size > 0 and date < self._dates[self._size - 1]:
+            self._sorted = False
+        self._dates[self._size] = date
+        self._close[self._size] = close
+        self._volume[self._size] = volume
+        self._size = self._size + 1
+        self.version = self.version + 1
+
+    def extend(self, dates, close, volume):
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        count = len(dates)
+        if count == 0:
+            return
+        self._reserve(self._size + count)
+        end = self._size + count
+        if self._size > 0 and dates[0] < self._dates[self._size - 1]:
+            self._sorted = False
+        if not np.all(dates[1:] >= dates[:-1]):
+            self._sorted = False
+        self._dates[self._size:end] = dates
+        self._close[self._size:end] = close
+        self._volume[self._size:end] = volume
+        self._size = end
+        self.version = self.version + 1
+
+    def clear(self):
+        self._size = 0
+        self._sorted = True
+        self.version = self.version + 1
+
+    # Add or replace one day, keeping the series sorted with unique dates.
+    # The sorted dates column is the date index: finding the position is a binary
+    # search, and adding after the last day (the usual case) is an append.
+    # Returns True if a day was added, False if an existing day was replaced.
+    def upsert(self, date, close, volume):
+        date = np.datetime64(date, "D")
+        if self._size == 0 or (self._sorted and date > self._dates[self._size - 1]):
+            self.append(date, close, volume)
+            return True
+        self.sort()
+        index = int(np.searchsorted(self.dates, date))
+        if index < self._size and self._dates[index] == date:
+            self.set(index, close, volume)
+            return False
+        self._reserve(self._size + 1)
+        for column in (self._dates, self._close, self._volume):
+            column[index + 1:self._size + 1] = column[index:self._size]
+        self._dates[index] = date
+        self._close[index] = float(close)
+        self._volume[index] = float(volume)
+        self._size = self._size + 1
+        self.version = self.version + 1
+        return True
+
+    # Merge date, close and volume arrays into the series in linear time, keeping it
+    # sorted with unique dates. Later rows win for repeated dates.
+    # Returns (days added, days replaced).
+    def merge(self, dates, close, volume):
+        batch = PriceSeries.from_arrays(np.array(dates, dtype="datetime64[D]"), np.array(close, dtype=np.float64), np.array(volume, dtype=np.float64))
+        batch.sort()
+        batch._dedupe()
+        if len(batch) == 0:
+            return (0, 0)
+        if self._size == 0 or (self._sorted and batch._dates[0] > self._dates[self._size - 1]):
+            self.extend(batch.dates, batch.close, batch.volume)
+            return (len(batch), 0)
+        self.sort()
+        self._dedupe()
+        index = np.searchsorted(self.dates, batch.dates)
+        found = index < self._size
+        found[found] = self.dates[index[found]] == batch.dates[found]
+        self.close[index[found]] = batch.close[found]
+        self.volume[index[found]] = batch.volume[found]
+        new = ~found
+        if np.any(new):
+            self._dates = np.insert(self.dates, index[new], batch.dates[new])
+            self._close = np.insert(self.close, index[new], batch.close[new])
+            self._volume = np.insert(self.volume, index[new], batch.volume[new])
+            self._size = len(self._dates)
+        self.version = self.version + 1
+        return (int(np.count_nonzero(new)), int(np.count_nonzero(found)))
+
+    # Drop repeated dates from a sorted series, keeping the last row for each date
+    def _dedupe(self):
+        if self._size < 2:
+            return
+        keep = np.append(self.dates[1:] != self.dates[:-1], True)
+        if np.all(keep):
+            return
+        self._dates = self.dates[keep]
+        self._close = self.close[keep]
+        self._volume = self.volume[keep]
+        self._size = len(self._dates)
+        self.version = self.version + 1
+
+    # Sort by date (oldest to newest); equal dates keep their order
+    def sort(self):
+        if self._sorted:
+            return
+        order = np.argsort(self.dates, kind="stable")
+        self._dates[:self._size] = self.dates[order]
+        self._close[:self._size] = self.close[order]
+        self._volume[:self._size] = self.volume[order]
+        self._sorted = True
+        self.version = self.version + 1
+
+    # Position of the first row for a date, or -1
+    def index_of(self, date):
+        date = np.datetime64(date, "D")
+        if self._sorted:
+            index = int(np.searchsorted(self.dates, date))
+            return index if index < self._size and self._dates[index] == date else -1
+        matches = np.flatnonzero(self.dates == date)
+        return int(matches[0]) if len(matches) else -1
+
+    def set(self, index, close, volume):
+        self.close[index] = float(close)
+        self.volume[index] = float(volume)
+        self.version = self.version + 1
+
+    # Remove every row for a date and return the number removed
+    def remove(self, date):
+        keep = self.dates != np.datetime64(date, "D")
+        count = self._size - int(np.count_nonzero(keep))
+        if count:
+            self._dates = self.dates[keep]
+            self._close = self.close[keep]
+            self._volume = self.volume[keep]
+            self._size = len(self._dates)
+            self.version = self.version + 1
+        return count
+
+    # Rows from start to end (inclusive) by date as a series sharing this one's memory
+    def between(self, start=None, end=None):
+        self.sort()
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, "D"), side="left"))
+        hi = self._size if end is None else int(np.searchsorted(self.dates, np.datetime64(end, "D"), side="right"))
+        return self[lo:hi]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PriceSeries.from_arrays(self.dates[index], self.close[index], self.volume[index])
+        if index < 0:
+            index = index + self._size
+        if not 0 <= index < self._size:
+            raise IndexError("PriceSeries index out of range")
+        return DailyData(self._dates[index].astype("datetime64[us]").item(), float(self._close[index]), float(self._volume[index]))
+
+    # All rows as DailyData objects
+    def to_daily_data(self):
+        dates = self.dates.astype("datetime64[us]").tolist()
+        return [DailyData(date, close, volume) for date, close, volume in zip(dates, self.close.tolist(), self.volume.tolist())]
+
+
+# List-style view of a stock's PriceSeries for code that works with DailyData objects.
+# Items are created on access, so change values through Stock.update_data rather than
+# the DailyData setters.
+class DailyDataList:
+    def __init__(self, stock):
+        self._stock = stock
+
+    def __len__(self):
+        return len(self._stock.series)
+
+    def __iter__(self):
+        return iter(self._stock.series.to_daily_data())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._stock.series[index].to_daily_data()
+        return self._stock.series[index]
+
+    def __repr__(self):
+        return f"<DailyDataList {self._stock.symbol}: {len(self)} days>"
+
+    def append(self, daily_data):
+        self._stock.add_data(daily_data)
+
+    # Sort by date by default; any other key or order falls back to sorting DailyData objects
+    def sort(self, key=None, reverse=False):
+        if key is None and not reverse:
+            self._stock.series.sort()
+            return
+        items = list(self)
+        items.sort(key=key if key is not None else (lambda x: x.date), reverse=reverse)
+        series = self._stock.series
+        series.clear()
+        series.extend([np.datetime64(item.date, "D") for item in items], [item.close for item in items], [item.volume for item in items])
+
+
 # Unit Test - Do Not Change Code Below This Line *** *** *** *** *** *** *** *** ***
 # main() is used for unit testing only. It will run when stock_class.py is run.
 # Run this to test your class code. Once you have eliminated all errors, you are
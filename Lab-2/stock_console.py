@@ -1,10 +1,13 @@
 # Summary: This module contains the user interface and logic for a console-based version of the stock manager program.
 
 from datetime import datetime
-from stock_class import Stock, DailyData
+from stock_class import Stock, DailyData, Portfolio
 from utilities import clear_screen, display_stock_chart
-from os import path
 import stock_data
+import stock_db
+import batch_import
+import web_cache
+import report_renderer
 
 
 # Main Menu
@@ -82,6 +85,10 @@ def add_stock(stock_list):
     clear_screen()
     print("Add Stock ---")
     symbol = input("Enter Ticker Symbol: ").upper()
+    if symbol in stock_list:
+        print(f"{symbol} is already being tracked.")
+        input("Press Enter to Continue")
+        return
     name = input("Enter Company Name: ")
     try:
         shares = float(input("Enter Number of Shares: "))
@@ -118,14 +125,14 @@ def buy_stock(stock_list):
         print(stock.symbol + " ", end="")
     print("]")
     symbol = input("Which stock do you want to buy?: ").upper()
-    for stock in stock_list:
-        if stock.symbol == symbol:
-            try:
-                shares = float(input("How many shares do you want to buy?: "))
-                stock.buy(shares)
-                print("Shares Purchased")
-            except ValueError:
-                print("Invalid number.")
+    stock = stock_list.get(symbol)
+    if stock is not None:
+        try:
+            shares = float(input("How many shares do you want to buy?: "))
+            stock.buy(shares)
+            print("Shares Purchased")
+        except ValueError:
+            print("Invalid number.")
     input("Press Enter to Continue")
 
 # Sell Stocks (subtract from shares)
@@ -137,14 +144,14 @@ def sell_stock(stock_list):
         print(stock.symbol + " ", end="")
     print("]")
     symbol = input("Which stock do you want to sell?: ").upper()
-    for stock in stock_list:
-        if stock.symbol == symbol:
-            try:
-                shares = float(input("How many shares do you want to sell?: "))
-                stock.sell(shares)
-                print("Shares Sold")
-            except ValueError:
-                print("Invalid number.")
+    stock = stock_list.get(symbol)
+    if stock is not None:
+        try:
+            shares = float(input("How many shares do you want to sell?: "))
+            stock.sell(shares)
+            print("Shares Sold")
+        except ValueError:
+            print("Invalid number.")
     input("Press Enter to Continue")
 
 # Remove stock and all daily data
@@ -156,10 +163,8 @@ def delete_stock(stock_list):
         print(stock.symbol + " ", end="")
     print("]")
     symbol = input("Which stock do you want to delete?: ").upper()
-    for i, stock in enumerate(stock_list):
-        if stock.symbol == symbol:
-            del stock_list[i]
-            print("Stock Deleted")
+    if stock_list.remove(symbol) is not None:
+        print("Stock Deleted")
     input("Press Enter to Continue")
 
 # List stocks being tracked
@@ -182,35 +187,45 @@ def add_stock_data(stock_list):
     print("]")
     symbol = input("Which stock do you want to use?: ").upper()
     
-    for stock in stock_list:
-        if stock.symbol == symbol:
-            print(f"Ready to add data for: {symbol}")
-            print("Enter Data Separated by Commas (Date,Price,Volume)")
-            print("Example: 8/28/20,47.85,10550")
-            data = input("Enter Date, Price, Volume: ")
-            try:
-                parts = data.split(',')
-                date_obj = datetime.strptime(parts[0].strip(), "%m/%d/%y")
-                price = float(parts[1])
-                volume = float(parts[2])
-                daily_data = DailyData(date_obj, price, volume)
-                stock.add_data(daily_data)
-                print("Data Added")
-            except Exception as e:
-                print(f"Error adding data: {e}")
+    stock = stock_list.get(symbol)
+    if stock is not None:
+        print(f"Ready to add data for: {symbol}")
+        print("Enter Data Separated by Commas (Date,Price,Volume)")
+        print("Example: 8/28/20,47.85,10550")
+        data = input("Enter Date, Price, Volume: ")
+        try:
+            parts = data.split(',')
+            date_obj = datetime.strptime(parts[0].strip(), "%m/%d/%y")
+            price = float(parts[1])
+            volume = float(parts[2])
+            daily_data = DailyData(date_obj, price, volume)
+            stock.add_data(daily_data)
+            print("Data Added")
+        except Exception as e:
+            print(f"Error adding data: {e}")
     input("Press Enter to Continue")
 
 # Display Report for All Stocks
 def display_report(stock_list):
     clear_screen()
     print("Stock Report ---")
-    for stock in stock_list:
-        print(f"Report for: {stock.symbol} - {stock.name}")
-        print(f"Shares: {stock.shares}")
-        print(f"{'Date':<15} {'Price':<15} {'Volume':<15}")
-        for data in stock.DataList:
-            print(f"{data.date.strftime('%m/%d/%y'):<15} ${data.close:<14.2f} {data.volume:<15}")
-        print("-" * 20)
+    print("Options: --limit N (latest N days), --start m/d/yy, --end m/d/yy, --output FILE")
+    try:
+        options = report_renderer.parse_options(input("Enter options (Enter for full report): ").split())
+    except ValueError as e:
+        print(f"Invalid options: {e}")
+        input("Press Enter to Continue")
+        return
+    lines = report_renderer.report_lines(stock_list, options.start, options.end, options.limit)
+    if options.output:
+        try:
+            report_renderer.export_report(lines, options.output)
+            print(f"Report written to {options.output}")
+        except OSError as e:
+            print(f"Error writing report: {e}")
+    else:
+        clear_screen()
+        report_renderer.page_report(lines, options.page_size)
     input("Press Enter to Continue")
 
 # Display Chart
@@ -220,7 +235,10 @@ def display_chart(stock_list):
         print(stock.symbol + " ", end="")
     print("]")
     symbol = input("Which stock do you want to chart?: ").upper()
-    display_stock_chart(stock_list, symbol)
+    filename = input("Save chart as PNG file (Enter to show on screen): ").strip()
+    display_stock_chart(stock_list, symbol, filename or None)
+    if filename:
+        input("Press Enter to Continue")
 
 # Manage Data Menu
 def manage_data(stock_list):
@@ -232,12 +250,16 @@ def manage_data(stock_list):
         print("2 - Load Data from Database")
         print("3 - Retrieve Data from Web")
         print("4 - Import from CSV File")
+        print("5 - Batch Import CSV Files (Folder)")
         print("0 - Exit Manage Data")
         option = input("Enter Menu Option: ")
         
         if option == "1":
-            stock_data.save_stock_data(stock_list)
+            summary = stock_data.save_stock_data(stock_list)
             print("Data Saved to Database")
+            print(f"Inserted: {summary['inserted']}  Updated: {summary['updated']}  Skipped: {summary['skipped']}  Deleted: {summary['deleted']}")
+            for symbol, date, message in summary["errors"]:
+                print(f"Not saved: {symbol} {date} - {message}")
             input("Press Enter to Continue")
         elif option == "2":
             stock_data.load_stock_data(stock_list)
@@ -247,6 +269,8 @@ def manage_data(stock_list):
             retrieve_from_web(stock_list)
         elif option == "4":
             import_csv(stock_list)
+        elif option == "5":
+            batch_import_csv()
         elif option == "0":
             print("Returning to Main Menu")
         else:
@@ -261,11 +285,17 @@ def retrieve_from_web(stock_list):
     
     dateStart = input("Enter starting date: (MM/DD/YY): ")
     dateEnd = input("Enter ending date: (MM/DD/YY): ")
+    gap_only = input("Only get the days after each stock's last stored day? (Y/N): ").strip().upper() == "Y"
     
     try:
         print("Processing... (This may take a moment)")
-        count = stock_data.retrieve_stock_web(dateStart, dateEnd, stock_list)
+        errors = []
+        count = stock_data.retrieve_stock_web(dateStart, dateEnd, stock_list, cache=web_cache.HistoryCache(), gap_only=gap_only, errors=errors)
         print(f"Records Retrieved: {count}")
+        if errors:
+            print(f"Stocks Not Retrieved: {len(errors)}")
+            for symbol, message in errors:
+                print(f"  {symbol}: {message}")
     except Exception as e:
         print(f"Error retrieving data: {e}")
         
@@ -283,21 +313,45 @@ def import_csv(stock_list):
     
     symbol = input("Which stock do you want to use?: ").upper()
     filename = input("Enter filename (full path): ")
-    
+    to_database = input("Write straight to the database instead of the stock list? (Y/N): ").strip().upper() == "Y"
+
     try:
-        stock_data.import_stock_web_csv(stock_list, symbol, filename)
-        print("CSV File Imported")
+        if to_database:
+            count = stock_data.import_stock_csv_to_database(symbol, filename)
+            print(f"CSV File Imported: {count} days written to the database")
+            print("Load Data from Database to see the imported history.")
+        else:
+            stock_data.import_stock_web_csv(stock_list, symbol, filename)
+            print("CSV File Imported")
     except Exception as e:
         print(f"Failed to import CSV: {e}")
         
     input("Press Enter to Continue")
 
+# Import a folder of CSV files (one per symbol, e.g. AAPL.csv) straight into the database
+def batch_import_csv():
+    clear_screen()
+    print("Batch Import CSV Files ---")
+    print("Files are matched to symbols by name (AAPL.csv -> AAPL).")
+    source = input("Enter folder or pattern (e.g. C:\\drops\\*.csv): ")
+    try:
+        summary = batch_import.batch_import(source)
+        print(f"Imported {summary['imported']} of {summary['files']} files, {summary['rows']} rows")
+        for filename, message in summary["errors"]:
+            print(f"Failed: {filename} - {message}")
+        print("Load Data from Database to see the imported history.")
+    except Exception as e:
+        print(f"Batch import failed: {e}")
+    input("Press Enter to Continue")
+
 # Begin program
 def main():
     #check for database, create if not exists
-    if path.exists("stocks.db") == False:
+    if stock_db.database_exists() == False:
         stock_data.create_database()
-    stock_list = []
+    else:
+        stock_data.upgrade_database()
+    stock_list = Portfolio()
     main_menu(stock_list)
 
 # Program Starts Here
@@ -0,0 +1,57 @@
+# Summary: This module reads Yahoo! Finance CSV history files into NumPy columns. It only needs
+# csv and numpy, so batch import worker processes can load it quickly.
+
+import csv
+import itertools
+import numpy as np
+
+# Yahoo! Finance CSV columns: Date[0], Close[4], Volume[6]
+CSV_DATE = 0
+CSV_CLOSE = 4
+CSV_VOLUME = 6
+
+# Convert a column of strings in one step; if any value is bad (e.g. "null"),
+# convert one at a time and leave the bad values as NaT/NaN
+def _csv_column(values, dtype, missing):
+    try:
+        return np.array(values, dtype=dtype)
+    except ValueError:
+        column = np.empty(len(values), dtype=dtype)
+        for i, value in enumerate(values):
+            try:
+                column[i] = value
+            except ValueError:
+                column[i] = missing
+        return column
+
+# Turn a chunk of CSV rows into (dates, close, volume) arrays, dropping rows that don't parse
+def _csv_chunk(rows):
+    rows = [row for row in rows if len(row) > CSV_VOLUME]
+    if not rows:
+        return (np.empty(0, dtype="datetime64[D]"), np.empty(0), np.empty(0))
+    columns = list(zip(*rows))
+    dates = _csv_column(columns[CSV_DATE], "datetime64[D]", np.datetime64("NaT"))
+    close = _csv_column(columns[CSV_CLOSE], np.float64, np.nan)
+    volume = _csv_column(columns[CSV_VOLUME], np.float64, np.nan)
+    valid = ~np.isnat(dates) & ~np.isnan(close) & ~np.isnan(volume)
+    return (dates[valid], close[valid], volume[valid])
+
+# Read a Yahoo! Finance CSV file in chunks of up to chunk_rows rows.
+# Yields (dates, close, volume) arrays so files of any size use bounded memory.
+def read_stock_csv(filename, chunk_rows=250000):
+    with open(filename, newline='') as stockdata:
+        datareader = csv.reader(stockdata, delimiter=',')
+        next(datareader, None) # Skip header
+        while True:
+            rows = list(itertools.islice(datareader, chunk_rows))
+            if not rows:
+                break
+            yield _csv_chunk(rows)
+
+# Read a whole Yahoo! Finance CSV file into (dates, close, volume) arrays
+def read_stock_columns(filename):
+    chunks = list(read_stock_csv(filename))
+    dates = np.concatenate([chunk[0] for chunk in chunks]) if chunks else np.empty(0, dtype="datetime64[D]")
+    close = np.concatenate([chunk[1] for chunk in chunks]) if chunks else np.empty(0)
+    volume = np.concatenate([chunk[2] for chunk in chunks]) if chunks else np.empty(0)
+    return dates, close, volume
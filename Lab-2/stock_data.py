@@ -1,19 +1,30 @@
 # Summary: This module contains the functions used by both console and GUI programs to manage stock data.
 
-import sqlite3
+import math
+import numpy as np
 from selenium import webdriver
-from bs4 import BeautifulSoup
-import csv
 import time
-from datetime import datetime
-from utilities import clear_screen, sortDailyData
-from stock_class import Stock, DailyData
+import queue
+import threading
+from collections import OrderedDict
+import urllib3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from utilities import clear_screen
+import stock_db
+from stock_class import Stock, DailyData, PriceSeries
+from history_parser import parse_history_page
+from storage import StorageBackend
+from stock_csv import read_stock_csv
+
+# Database schema version (stored in PRAGMA user_version)
+# 0 - dailyData.date stored as "%m/%d/%y" text
+# 1 - dailyData.date stored as ISO "%Y-%m-%d" text so it sorts chronologically
+SCHEMA_VERSION = 1
+DB_DATE_FORMAT = "%Y-%m-%d"
 
 # Create the SQLite database
 def create_database():
-    stockDB = "stocks.db"
-    conn = sqlite3.connect(stockDB)
-    cur = conn.cursor()
     createStockTableCmd = """CREATE TABLE IF NOT EXISTS stocks (
                             symbol TEXT NOT NULL PRIMARY KEY,
                             name TEXT,
@@ -26,138 +37,529 @@ def create_database():
                                 volume REAL NOT NULL,
                                 PRIMARY KEY (symbol, date)
                         );"""   
-    cur.execute(createStockTableCmd)
-    cur.execute(createDailyDataTableCmd)
+    with stock_db.writer() as conn:
+        cur = conn.cursor()
+        cur.execute(createStockTableCmd)
+        cur.execute(createDailyDataTableCmd)
+        if cur.execute("PRAGMA user_version;").fetchone()[0] == 0 and cur.execute("SELECT COUNT(*) FROM dailyData;").fetchone()[0] == 0:
+            cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION};") # new database - nothing to migrate
+    upgrade_database()
 
-# Save stocks and daily data into database
-def save_stock_data(stock_list):
-    stockDB = "stocks.db"
-    conn = sqlite3.connect(stockDB)
-    cur = conn.cursor()
-    insertStockCmd = """INSERT INTO stocks
+# Version 0 -> 1: rewrite "%m/%d/%y" dates as ISO dates.
+# Rows that are already ISO (e.g. written by a newer version before the upgrade) are left
+# alone and win over an old-format row for the same day. Rows with dates that can't be
+# parsed are moved to dailyDataRejected and reported rather than stopping the upgrade.
+def _migrate_iso_dates(conn):
+    converted = []
+    unparsed = []
+    for rowid, symbol, date in conn.execute("SELECT rowid, symbol, date FROM dailyData;").fetchall():
+        try:
+            datetime.strptime(date, DB_DATE_FORMAT)
+            continue
+        except (TypeError, ValueError):
+            pass
+        try:
+            converted.append((datetime.strptime(date, "%m/%d/%y").strftime(DB_DATE_FORMAT), rowid, date))
+        except (TypeError, ValueError):
+            unparsed.append((rowid, symbol, date))
+    conn.executemany("UPDATE OR IGNORE dailyData SET date = ? WHERE rowid = ? AND date = ?;", converted)
+    # rows left in the old format clashed with an ISO row for the same day
+    conn.executemany("DELETE FROM dailyData WHERE rowid = ? AND date = ?;", [(rowid, date) for _, rowid, date in converted])
+    if unparsed:
+        conn.execute("CREATE TABLE IF NOT EXISTS dailyDataRejected AS SELECT * FROM dailyData WHERE 0;")
+        conn.executemany("INSERT INTO dailyDataRejected SELECT * FROM dailyData WHERE rowid = ?;", [(rowid,) for rowid, _, _ in unparsed])
+        conn.executemany("DELETE FROM dailyData WHERE rowid = ?;", [(rowid,) for rowid, _, _ in unparsed])
+        print(f"Moved {len(unparsed)} rows with unreadable dates to dailyDataRejected:")
+        for _, symbol, date in unparsed[:10]:
+            print(f"  {symbol} {date!r}")
+
+# Migrations in order - MIGRATIONS[n] upgrades a version n database to version n + 1
+MIGRATIONS = [_migrate_iso_dates]
+
+# Bring an existing database up to SCHEMA_VERSION in place.
+# Each migration runs in its own transaction together with the version bump.
+def upgrade_database():
+    with stock_db.writer() as conn:
+        version = conn.execute("PRAGMA user_version;").fetchone()[0]
+        while version < SCHEMA_VERSION:
+            with conn:
+                MIGRATIONS[version](conn)
+                version = version + 1
+                conn.execute(f"PRAGMA user_version = {version};")
+    return version
+
+# Reason a daily data row can't be saved (dailyData columns are NOT NULL), or None
+def _daily_row_error(date, close, volume):
+    if date == "NaT":
+        return "Missing date"
+    for label, value in (("close", close), ("volume", volume)):
+        try:
+            if not math.isfinite(value):
+                return f"Invalid {label} {value}"
+        except TypeError:
+            return f"Invalid {label} {value!r}"
+    return None
+
+# Save stocks and daily data into database using one transaction.
+# Stocks that were loaded or saved before only write their changes (see Stock.changed_rows).
+# Returns a summary dict with the rows inserted, updated, skipped (unchanged) and deleted
+# plus a list of (symbol, date, message) for rows that could not be saved.
+# Rows without a valid date, close and volume are not written; their stocks keep their
+# pending changes so the rows are tried again on the next save.
+def _save_sqlite(stock_list):
+    insertStockCmd = """INSERT OR IGNORE INTO stocks
                             (symbol, name, shares)
                             VALUES
                             (?, ?, ?); """
-    insertDailyDataCmd = """INSERT INTO dailyData
+    updateStockCmd = """UPDATE stocks
+                            SET name = ?, shares = ?
+                            WHERE symbol = ?
+                            AND (name IS NOT ? OR shares IS NOT ?); """
+    insertDailyDataCmd = """INSERT OR IGNORE INTO dailyData
                                     (symbol, date, price, volume)
                                     VALUES
                                     (?, ?, ?, ?);"""
+    updateDailyDataCmd = """UPDATE dailyData
+                                    SET price = ?, volume = ?
+                                    WHERE symbol = ? AND date = ?
+                                    AND (price <> ? OR volume <> ?);"""
+    deleteDailyDataCmd = """DELETE FROM dailyData
+                                    WHERE symbol = ? AND date = ?;"""
+    summary = {"inserted": 0, "updated": 0, "skipped": 0, "deleted": 0, "errors": []}
+    stockRows = []
+    dailyRows = []
+    deleteRows = []
+    failed = set() # symbols with rows that were not written
     for stock in stock_list:
-        insertValues = (stock.symbol, stock.name, stock.shares)
+        if stock.stock_changed:
+            stockRows.append((stock.symbol, stock.name, stock.shares))
         try:
-            cur.execute(insertStockCmd, insertValues)
-            cur.execute("COMMIT;")
-        except:
-            pass
-        for daily_data in stock.DataList: 
-            insertValues = (stock.symbol,daily_data.date.strftime("%m/%d/%y"),daily_data.close,daily_data.volume)
-            try:
-                cur.execute(insertDailyDataCmd, insertValues)
-                cur.execute("COMMIT;")
-            except:
-                pass
-    
-# Load stocks and daily data from database
-def load_stock_data(stock_list):
+            rows = stock.changed_rows()
+        except (AttributeError, TypeError, ValueError) as e:
+            summary["errors"].append((stock.symbol, None, str(e)))
+            failed.add(stock.symbol)
+            rows = []
+        for date, close, volume in rows:
+            message = _daily_row_error(date, close, volume)
+            if message is None:
+                dailyRows.append((stock.symbol, date, close, volume))
+            else:
+                summary["errors"].append((stock.symbol, date, message))
+                failed.add(stock.symbol)
+        for date in stock.deleted_dates():
+            deleteRows.append((stock.symbol, str(np.datetime64(date, "D"))))
+    with stock_db.transaction() as conn:
+        cur = conn.cursor()
+        cur.executemany(insertStockCmd, stockRows)
+        stockInserted = max(cur.rowcount, 0)
+        cur.executemany(updateStockCmd, [(name, shares, symbol, name, shares) for symbol, name, shares in stockRows])
+        stockUpdated = max(cur.rowcount, 0)
+        # deletes first, so a day removed and then added again ends up stored
+        cur.executemany(deleteDailyDataCmd, deleteRows)
+        summary["deleted"] = max(cur.rowcount, 0)
+        cur.executemany(insertDailyDataCmd, dailyRows)
+        dailyInserted = max(cur.rowcount, 0)
+        cur.executemany(updateDailyDataCmd, [(price, volume, symbol, date, price, volume) for symbol, date, price, volume in dailyRows])
+        dailyUpdated = max(cur.rowcount, 0)
+    for stock in stock_list:
+        if stock.symbol not in failed:
+            stock.mark_clean()
+    summary["inserted"] = stockInserted + dailyInserted
+    summary["updated"] = stockUpdated + dailyUpdated
+    summary["skipped"] = len(stockRows) + len(dailyRows) - summary["inserted"] - summary["updated"]
+    return summary
+
+# Load stocks and daily data from database.
+# One ordered query returns every stock with its history; rows are grouped
+# in a single pass and each stock's columns are filled in one step, already sorted by date.
+# progress(stock) is called as each stock finishes loading; it may raise to stop the load.
+def _load_sqlite(stock_list, progress=None):
     stock_list.clear()
-    stockDB = "stocks.db"
-    conn = sqlite3.connect(stockDB)
-    stockCur = conn.cursor()
-    stockSelectCmd = """SELECT symbol, name, shares
-                    FROM stocks; """
-    stockCur.execute(stockSelectCmd)
-    stockRows = stockCur.fetchall()
-    for row in stockRows:
-        new_stock = Stock(row[0],row[1],row[2])
-        dailyDataCur = conn.cursor()
-        dailyDataCmd = """SELECT date, price, volume
+    loadCmd = """SELECT s.symbol, s.name, s.shares, d.date, d.price, d.volume
+                    FROM stocks s
+                    LEFT JOIN dailyData d ON d.symbol = s.symbol
+                    ORDER BY s.symbol, d.date; """
+    def finish_stock(stock, dates, prices, volumes):
+        if stock is None:
+            return
+        if dates:
+            stock.series.extend(np.array(dates, dtype="datetime64[D]"), prices, volumes)
+        stock.mark_clean()
+        if progress is not None:
+            progress(stock)
+    with stock_db.reader() as conn:
+        new_stock = None
+        dates, prices, volumes = [], [], []
+        for symbol, name, shares, date, price, volume in conn.execute(loadCmd):
+            if new_stock is None or symbol != new_stock.symbol:
+                finish_stock(new_stock, dates, prices, volumes)
+                dates, prices, volumes = [], [], []
+                new_stock = Stock(symbol, name, shares)
+                stock_list.append(new_stock)
+            if date is not None:
+                dates.append(date)
+                prices.append(price)
+                volumes.append(volume)
+        finish_stock(new_stock, dates, prices, volumes)
+
+# Loader for lazily loaded stocks (see Stock.set_series_loader). Fetches a stock's history
+# from the database on first use and keeps the histories of the capacity most recently
+# used stocks in memory; older ones are dropped, unless they have unsaved changes, and
+# fetched again the next time they are used.
+class LazyHistory:
+    def __init__(self, capacity=20):
+        self.capacity = capacity
+        self._recent = OrderedDict() # symbol -> Stock, least recently used first
+        self._latest = {} # symbol -> (n, latest_closes rows), kept until the next save or load
+        self._lock = threading.Lock()
+
+    def load(self, stock):
+        historyCmd = """SELECT date, price, volume
                         FROM dailyData
-                        WHERE symbol=?; """
-        selectValue = (new_stock.symbol)
-        dailyDataCur.execute(dailyDataCmd,(selectValue,))
-        dailyDataRows = dailyDataCur.fetchall()
-        for dailyRow in dailyDataRows:
-            daily_data = DailyData(datetime.strptime(dailyRow[0],"%m/%d/%y"),float(dailyRow[1]),float(dailyRow[2]))
-            new_stock.add_data(daily_data)
-        stock_list.append(new_stock)
-    sortDailyData(stock_list)
-
-# Get stock price history from web using Web Scraping
-def retrieve_stock_web(dateStart, dateEnd, stock_list):
-    # Convert dates to Unix timestamp for Yahoo Finance
-    try:
-        dateFrom = str(int(time.mktime(time.strptime(dateStart, "%m/%d/%y"))))
-        dateTo = str(int(time.mktime(time.strptime(dateEnd, "%m/%d/%y"))))
-    except ValueError:
-        print("Invalid Date Format. Please use m/d/yy")
-        return 0
+                        WHERE symbol = ?
+                        ORDER BY date; """
+        with stock_db.reader() as conn:
+            rows = conn.execute(historyCmd, (stock.symbol,)).fetchall()
+        if rows:
+            dates, prices, volumes = zip(*rows)
+            series = PriceSeries.from_arrays(np.array(dates, dtype="datetime64[D]"), prices, volumes, is_sorted=True)
+        else:
+            series = PriceSeries()
+        with self._lock:
+            self._latest.pop(stock.symbol, None)
+            self._recent[stock.symbol] = stock
+            self._recent.move_to_end(stock.symbol)
+            for symbol, old in list(self._recent.items()):
+                if len(self._recent) <= self.capacity:
+                    break
+                if old is not stock and (old.unload_series() or not old.series_loaded):
+                    del self._recent[symbol]
+        return series
 
-    recordCount = 0
+    # The last n (date, close) pairs of a stock from the database, oldest first,
+    # without loading its history (see Stock.latest_closes). Results are kept until
+    # the stock is loaded or forget_latest() is called, so asking again is free.
+    def latest_closes(self, stock, n=1):
+        latestCmd = """SELECT date, price
+                        FROM dailyData
+                        WHERE symbol = ?
+                        ORDER BY date DESC
+                        LIMIT ?; """
+        n = max(int(n), 0)
+        with self._lock:
+            cached = self._latest.get(stock.symbol)
+        if cached is not None and cached[0] >= n:
+            rows = cached[1]
+            return rows[max(len(rows) - n, 0):]
+        with stock_db.reader() as conn:
+            rows = conn.execute(latestCmd, (stock.symbol, n)).fetchall()
+        rows = [(datetime.strptime(date, DB_DATE_FORMAT).date(), float(price)) for date, price in reversed(rows)]
+        with self._lock:
+            self._latest[stock.symbol] = (n, rows)
+        return list(rows)
 
-    for stock in stock_list:
-        stockSymbol = stock.symbol
-        # URL construction
-        url = "https://finance.yahoo.com/quote/" + stockSymbol + "/history?period1=" + dateFrom + "&period2=" + dateTo + "&interval=1d&filter=history&frequency=1d"
-        
-        # Setup Chrome options
+    # Drop the cached latest closes (after the database has been written)
+    def forget_latest(self):
+        with self._lock:
+            self._latest.clear()
+
+    def touch(self, stock):
+        with self._lock:
+            if stock.symbol in self._recent:
+                self._recent.move_to_end(stock.symbol)
+
+    # Symbols with their history in memory, least recently used first
+    def loaded_symbols(self):
+        with self._lock:
+            return list(self._recent)
+
+# The stocks.db tables as a storage backend (see storage.py).
+# A lazy load reads only the stocks table; each history is fetched on first use and
+# at most cache_size of them are kept in memory (see LazyHistory).
+class SQLiteStorage(StorageBackend):
+    def __init__(self, cache_size=20):
+        self.history = LazyHistory(cache_size)
+
+    def load(self, stock_list, progress=None, lazy=False):
+        if not lazy:
+            _load_sqlite(stock_list, progress)
+            return
+        stock_list.clear()
+        self.history = LazyHistory(self.history.capacity)
+        with stock_db.reader() as conn:
+            rows = conn.execute("SELECT symbol, name, shares FROM stocks ORDER BY symbol;").fetchall()
+        for symbol, name, shares in rows:
+            stock = Stock(symbol, name, shares)
+            stock.set_series_loader(self.history)
+            stock.mark_clean()
+            stock_list.append(stock)
+            if progress is not None:
+                progress(stock)
+
+    def save(self, stock_list):
+        try:
+            return _save_sqlite(stock_list)
+        finally:
+            self.history.forget_latest()
+
+    def last_dates(self):
+        lastDateCmd = """SELECT symbol, MAX(date)
+                            FROM dailyData
+                            GROUP BY symbol; """
+        with stock_db.reader() as conn:
+            return {symbol: datetime.strptime(date, DB_DATE_FORMAT).date() for symbol, date in conn.execute(lastDateCmd)}
+
+_storage = SQLiteStorage()
+
+# Backend used by save_stock_data and load_stock_data (SQLiteStorage until changed)
+def get_storage():
+    return _storage
+
+def set_storage(backend):
+    global _storage
+    _storage = backend
+
+# Save stocks and daily data with the storage backend (see storage.StorageBackend.save)
+def save_stock_data(stock_list):
+    return _storage.save(stock_list)
+
+# Load stocks and daily data with the storage backend, replacing stock_list's contents.
+# progress(stock) is called as each stock finishes loading; it may raise to stop the load.
+# With lazy, only the stock list is read now and each stock's history on first use.
+def load_stock_data(stock_list, progress=None, lazy=False):
+    _storage.load(stock_list, progress, lazy)
+
+YAHOO_HISTORY_URL = "https://finance.yahoo.com/quote/{symbol}/history?period1={start}&period2={end}&interval=1d&filter=history&frequency=1d"
+
+# Bounded pool of Chrome sessions shared by the retrieval threads.
+# Sessions are created on demand (at most size of them), reused for every symbol
+# and all quit by close() - use the pool in a with statement.
+class BrowserPool:
+    def __init__(self, size, wait=10):
+        self._size = size
+        self._wait = wait
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new_driver(self):
         options = webdriver.ChromeOptions()
         options.add_experimental_option('excludeSwitches', ['enable-logging'])
         options.add_experimental_option("prefs", {'profile.managed_default_content_settings.javascript': 2})
-        
         try:
             driver = webdriver.Chrome(options=options)
-            driver.implicitly_wait(60)
-            driver.get(url)
-        except:
+        except Exception:
             raise RuntimeWarning("Chrome Driver Not Found")
+        driver.implicitly_wait(self._wait)
+        with self._lock:
+            self._drivers.append(driver)
+        return driver
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self._size
+            if create:
+                self._created = self._created + 1
+        if not create:
+            return self._idle.get()
+        try:
+            return self._new_driver()
+        except Exception:
+            with self._lock:
+                self._created = self._created - 1
+            raise
+
+    # Load a page and return its HTML
+    def fetch(self, url):
+        driver = self._acquire()
+        try:
+            driver.get(url)
+            return driver.page_source
+        finally:
+            self._idle.put(driver)
+
+    def close(self):
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# Plain HTTP alternative to BrowserPool - the pages are loaded with JavaScript
+# disabled anyway, so a pooled HTTP client returns the same HTML far faster.
+class HttpPool:
+    def __init__(self, size, timeout=30):
+        self._http = urllib3.PoolManager(maxsize=size, block=True, timeout=timeout,
+                                         headers={"User-Agent": "Mozilla/5.0 (stock manager)"})
+
+    def fetch(self, url):
+        response = self._http.request("GET", url)
+        if response.status >= 400:
+            raise RuntimeWarning(f"HTTP {response.status} retrieving {url}")
+        return response.data.decode("utf-8", errors="replace")
+
+    def close(self):
+        self._http.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# Convert a m/d/yy date to the Unix timestamp Yahoo Finance uses in its URLs
+def _yahoo_timestamp(date):
+    return str(int(time.mktime(time.strptime(date, "%m/%d/%y"))))
 
-        # Parse Page
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        
-        # Find data rows
-        dataRows = soup.find_all('tr')
-        
-        for row in dataRows:
-            td = row.find_all('td')
-            rowList = [i.text for i in td]
-            columnCount = len(rowList)
-            
-            # Standard data row has 7 columns (Date, Open, High, Low, Close, Adj Close, Volume)
-            if columnCount == 7: 
+HISTORY_INTERVAL = "1d" # daily prices (the interval in YAHOO_HISTORY_URL)
+
+# Fetch price history pages for symbols from the web.
+# Up to workers symbols are fetched at once through a pool of reused sessions
+# (Chrome, or plain HTTP when use_browser is False). url_template can point at
+# a local server of saved pages for testing. parser picks the history_parser backend.
+# starts optionally gives a later m/d/yy start date per symbol (see gap_start_dates).
+# With a web_cache.HistoryCache, symbols and ranges fetched recently come from the cache
+# and new pages are added to it.
+# Yields (symbol, dates, closes, volumes) as each page arrives; closing the generator
+# cancels the pages not yet fetched. A symbol whose page can't be fetched or read is
+# skipped, and (symbol, message) is added to errors when a list is given.
+# Raises ValueError for dates not in m/d/yy format.
+def fetch_stock_history(dateStart, dateEnd, symbols, workers=4, use_browser=True, url_template=YAHOO_HISTORY_URL, parser="auto", cache=None, starts=None, errors=None):
+    dateTo = _yahoo_timestamp(dateEnd)
+    ranges = {symbol: _yahoo_timestamp(starts.get(symbol, dateStart) if starts else dateStart) for symbol in symbols}
+    symbols = []
+    for symbol, dateFrom in ranges.items():
+        cached = cache.get(symbol, dateFrom, dateTo, HISTORY_INTERVAL) if cache is not None else None
+        if cached is None:
+            symbols.append(symbol)
+        elif len(cached[0]) > 0:
+            yield (symbol,) + cached
+    if len(symbols) == 0:
+        return
+    workers = max(1, min(workers, len(symbols)))
+    pool = BrowserPool(workers) if use_browser else HttpPool(workers)
+    with pool, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(pool.fetch, url_template.format(symbol=symbol, start=ranges[symbol], end=dateTo)): symbol
+                   for symbol in symbols}
+        try:
+            for future in as_completed(futures):
+                symbol = futures[future]
                 try:
-                    # Parse Data: Date[0], Close[5], Volume[6]
-                    date_obj = datetime.strptime(rowList[0], "%b %d, %Y")
-                    close_price = float(rowList[5].replace(',', ''))
-                    volume = float(rowList[6].replace(',', ''))
-                    
-                    daily_data = DailyData(date_obj, close_price, volume)
-                    stock.add_data(daily_data)
-                    recordCount += 1
-                except ValueError:
-                    continue 
+                    history = parse_history_page(future.result(), parser)
+                except Exception as e: # one bad symbol doesn't stop the others
+                    if errors is not None:
+                        errors.append((symbol, str(e)))
+                    continue
+                if not history:
+                    continue # not cached - an empty page is often a block or an error page, so ask again next time
+                dates, closes, volumes = zip(*history)
+                dates, closes, volumes = np.array(dates, dtype="datetime64[D]"), np.array(closes, dtype=np.float64), np.array(volumes, dtype=np.float64)
+                if cache is not None:
+                    cache.put(symbol, ranges[symbol], dateTo, HISTORY_INTERVAL, dates, closes, volumes)
+                yield symbol, dates, closes, volumes
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+# Start dates (m/d/yy) that fetch only the days after each stock's last stored day - the
+# later of its last day in the storage backend (see set_storage) or in memory. Stocks with
+# no data start at dateStart; stocks already up to dateEnd are left out.
+def gap_start_dates(dateStart, dateEnd, stock_list):
+    start = datetime.strptime(dateStart, "%m/%d/%y").date()
+    end = datetime.strptime(dateEnd, "%m/%d/%y").date()
+    stored = get_storage().last_dates()
+    starts = {}
+    for stock in stock_list:
+        last = stored.get(stock.symbol)
+        if stock.series_loaded and len(stock.series) > 0:
+            stock.series.sort()
+            in_memory = stock.series.dates[-1].item()
+            last = in_memory if last is None else max(last, in_memory)
+        first = start if last is None else max(start, last + timedelta(days=1))
+        if first <= end:
+            starts[stock.symbol] = first.strftime("%m/%d/%y")
+    return starts
+
+# Get stock price history from web using Web Scraping (see fetch_stock_history for the options).
+# With gap_only, each stock only fetches the days after its last stored day.
+# Returns the number of days retrieved. Symbols that fail are reported and left out;
+# pass a list as errors to get them as (symbol, message) instead.
+def retrieve_stock_web(dateStart, dateEnd, stock_list, workers=4, use_browser=True, url_template=YAHOO_HISTORY_URL, parser="auto", cache=None, gap_only=False, errors=None):
+    try:
+        _yahoo_timestamp(dateStart)
+        _yahoo_timestamp(dateEnd)
+    except ValueError:
+        print("Invalid Date Format. Please use m/d/yy")
+        return 0
 
+    recordCount = 0
+    stocks = {stock.symbol: stock for stock in stock_list}
+    starts = gap_start_dates(dateStart, dateEnd, stock_list) if gap_only else None
+    symbols = [symbol for symbol in stocks if starts is None or symbol in starts]
+    failed = [] if errors is None else errors
+    for symbol, dates, closes, volumes in fetch_stock_history(dateStart, dateEnd, symbols, workers, use_browser, url_template, parser, cache, starts, failed):
+        # pages list newest first - merge the whole page at once
+        stocks[symbol].add_series(dates, closes, volumes)
+        recordCount += len(dates)
+    if errors is None:
+        for symbol, message in failed:
+            print("Error retrieving", symbol, "-", message)
     return recordCount
 
 # Get price and volume history from Yahoo! Finance using CSV import.
+# Returns the number of days imported.
 def import_stock_web_csv(stock_list, symbol, filename):
-    for stock in stock_list:
-        if stock.symbol == symbol:
-            try:
-                with open(filename, newline='') as stockdata:
-                    datareader = csv.reader(stockdata, delimiter=',')
-                    next(datareader) # Skip header
-                    for row in datareader:
-                        # CSV: Date[0], Close[4], Volume[6]
-                        try:
-                            date_obj = datetime.strptime(row[0], "%Y-%m-%d")
-                            close_price = float(row[4])
-                            volume = float(row[6])
-                            daily_data = DailyData(date_obj, close_price, volume)
-                            stock.add_data(daily_data)
-                        except (ValueError, IndexError):
-                            continue
-            except Exception as e:
-                print(f"Error reading CSV: {e}")
+    count = 0
+    stock = stock_list.get(symbol)
+    if stock is not None:
+        try:
+            for dates, close, volume in read_stock_csv(filename):
+                stock.add_series(dates, close, volume)
+                count = count + len(dates)
+        except Exception as e:
+            print(f"Error reading CSV: {e}")
+    return count
+
+# Upsert date, close and volume arrays for a symbol into dailyData on an open connection
+def upsert_daily_arrays(conn, symbol, dates, close, volume):
+    upsertDailyDataCmd = """INSERT INTO dailyData
+                                    (symbol, date, price, volume)
+                                    VALUES
+                                    (?, ?, ?, ?)
+                                ON CONFLICT(symbol, date) DO UPDATE SET
+                                    price = excluded.price,
+                                    volume = excluded.volume;"""
+    conn.executemany(upsertDailyDataCmd, zip([symbol] * len(dates), np.datetime_as_string(dates, unit="D").tolist(), close.tolist(), volume.tolist()))
+    return len(dates)
+
+# Import a Yahoo! Finance CSV file straight into the database without creating Stock or
+# DailyData objects. The symbol is added to the stocks table (with 0 shares) if it isn't
+# there yet, and existing dates are overwritten. Returns the number of days written.
+def import_stock_csv_to_database(symbol, filename, chunk_rows=250000):
+    insertStockCmd = """INSERT OR IGNORE INTO stocks
+                            (symbol, name, shares)
+                            VALUES
+                            (?, ?, 0); """
+    create_database() # creates or upgrades the schema
+    count = 0
+    with stock_db.transaction() as conn:
+        conn.execute(insertStockCmd, (symbol, symbol))
+        for dates, close, volume in read_stock_csv(filename, chunk_rows):
+            count = count + upsert_daily_arrays(conn, symbol, dates, close, volume)
+    return count
 
 def main():
     clear_screen()
@@ -0,0 +1,147 @@
+# Summary: This module manages connections to the stock database. Connections are opened once
+# and reused: readers borrow a connection from a pool and all writes share one writer connection,
+# one transaction at a time. The database runs in WAL mode, so readers (the GUI, queries) keep
+# working while a background task writes.
+#
+#   with stock_db.reader() as conn:        # concurrent reads from any thread
+#       conn.execute("SELECT ...")
+#   with stock_db.transaction() as conn:   # one writer at a time, commit or rollback
+#       conn.execute("INSERT ...")
+#
+# The database path defaults to stocks.db (or the STOCKS_DB environment variable);
+# call configure(path, **pragmas) to use another file or different settings.
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DEFAULT_PATH = os.environ.get("STOCKS_DB", "stocks.db")
+
+# PRAGMA settings applied to every connection (None leaves SQLite's default)
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",    # readers don't block the writer and the writer doesn't block readers
+    "synchronous": "NORMAL",  # with WAL only checkpoints wait for the disk, still crash safe
+    "cache_size": -32000,     # page cache in KiB when negative (about 32 MB)
+    "mmap_size": 268435456,   # read the file through a 256 MB memory map
+    "temp_store": "MEMORY",
+}
+
+class ConnectionManager:
+    def __init__(self, path=DEFAULT_PATH, timeout=30.0, **pragmas):
+        self.path = path
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        self.pragmas.update(pragmas)
+        self._idle = queue.SimpleQueue()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._depth = 0 # nested transaction() calls
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            if value is not None:
+                conn.execute(f"PRAGMA {name} = {value};")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    # Borrow a connection for reading. Connections go back to the pool afterwards,
+    # so each thread reading at the same time gets its own. One that close() shut
+    # while it was borrowed is left out of the new pool.
+    @contextmanager
+    def reader(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                current = any(open_conn is conn for open_conn in self._connections)
+                if current:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    self._idle.put(conn)
+
+    # The writer connection, held by one thread at a time. Use it for statements that
+    # manage their own transactions (e.g. migrations); otherwise use transaction().
+    @contextmanager
+    def writer(self):
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            yield self._writer
+
+    # The writer connection inside a transaction: committed when the block ends,
+    # rolled back if it raises. Nested calls join the outer transaction.
+    @contextmanager
+    def transaction(self):
+        with self.writer() as conn:
+            if self._depth > 0:
+                self._depth = self._depth + 1
+                try:
+                    yield conn
+                finally:
+                    self._depth = self._depth - 1
+                return
+            self._depth = 1
+            try:
+                with conn:
+                    yield conn
+            finally:
+                self._depth = 0
+
+    # Close every connection. The manager can still be used - it reconnects on demand.
+    def close(self):
+        with self._write_lock, self._lock:
+            connections, self._connections = self._connections, []
+            self._writer = None
+            self._idle = queue.SimpleQueue()
+        for conn in connections:
+            conn.close()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+# Use the database at path with the given PRAGMA settings from now on
+def configure(path=DEFAULT_PATH, **pragmas):
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close()
+        _manager = ConnectionManager(path, **pragmas)
+    return _manager
+
+# The shared connection manager (the default database until configure() is called)
+def get_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ConnectionManager()
+        return _manager
+
+def database_path():
+    return get_manager().path
+
+def database_exists():
+    return os.path.exists(database_path())
+
+def reader():
+    return get_manager().reader()
+
+def writer():
+    return get_manager().writer()
+
+def transaction():
+    return get_manager().transaction()
+
+def close():
+    if _manager is not None:
+        _manager.close()
@@ -0,0 +1,61 @@
+# Summary: This module contains read-only queries over the daily stock data in the database.
+# Filtering is done by SQLite using the (symbol, date) primary key so only the requested rows are loaded.
+
+from datetime import datetime, date as date_type
+from stock_class import DailyData
+from stock_data import DB_DATE_FORMAT
+import stock_db
+
+# Convert a datetime, date or "m/d/yy" string to the database date format
+def _db_date(value):
+    if isinstance(value, str):
+        value = datetime.strptime(value, "%m/%d/%y")
+    if isinstance(value, date_type):
+        return value.strftime(DB_DATE_FORMAT)
+    raise TypeError("Date must be a datetime, date or m/d/yy string")
+
+def _daily_data(rows):
+    return [DailyData(datetime.fromisoformat(row[0]), float(row[1]), float(row[2])) for row in rows]
+
+# Daily data for a symbol between start and end (inclusive), oldest to newest.
+# Leave start or end as None for an open-ended range.
+def get_history(symbol, start=None, end=None):
+    historyCmd = """SELECT date, price, volume
+                    FROM dailyData
+                    WHERE symbol = ? AND date >= ? AND date <= ?
+                    ORDER BY date; """
+    dateFrom = _db_date(start) if start is not None else ""
+    dateTo = _db_date(end) if end is not None else "9999-12-31"
+    with stock_db.reader() as conn:
+        rows = conn.execute(historyCmd, (symbol, dateFrom, dateTo)).fetchall()
+    return _daily_data(rows)
+
+# Most recent n days of data for a symbol, oldest to newest
+def get_latest(symbol, n):
+    latestCmd = """SELECT date, price, volume
+                    FROM dailyData
+                    WHERE symbol = ?
+                    ORDER BY date DESC
+                    LIMIT ?; """
+    with stock_db.reader() as conn:
+        rows = conn.execute(latestCmd, (symbol, int(n))).fetchall()
+    rows.reverse()
+    return _daily_data(rows)
+
+# Closing price on a date, or the last close before it (weekends, holidays).
+# Returns None if there is no data on or before the date.
+def get_close_on(symbol, date):
+    closeCmd = """SELECT price
+                    FROM dailyData
+                    WHERE symbol = ? AND date <= ?
+                    ORDER BY date DESC
+                    LIMIT 1; """
+    with stock_db.reader() as conn:
+        row = conn.execute(closeCmd, (symbol, _db_date(date))).fetchone()
+    return float(row[0]) if row is not None else None
+
+def main():
+    print("This module queries daily stock data stored in the database.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# Summary: This module contains the storage backends that save and load the stock list.
+# stock_data.save_stock_data/load_stock_data use the active backend (stock_data.set_storage):
+#   SQLiteStorage (stock_data) - stocks.db, writes only what changed (the default)
+#   MemoryStorage              - kept in this process, for tests
+#   NpzStorage                 - one NumPy .npz file of columns that loads straight into arrays
+#   MmapStorage                - a binary file per symbol, memory-mapped instead of read
+# A backend has load(stock_list, progress=None) and save(stock_list) -> summary dict, and
+# last_dates() -> {symbol: last stored day}.
+
+import json
+import os
+from abc import ABC, abstractmethod
+import numpy as np
+from stock_class import Stock, PriceSeries
+
+class StorageBackend(ABC):
+    # Replace the contents of stock_list with the stored stocks, in symbol order.
+    # progress(stock) is called as each stock finishes loading; it may raise to stop the load.
+    # With lazy, backends that support it load each stock's history on first use.
+    @abstractmethod
+    def load(self, stock_list, progress=None, lazy=False):
+        pass
+
+    # Store every stock in stock_list. Returns a summary dict with the rows inserted, updated,
+    # skipped (unchanged) and deleted plus a list of (symbol, date, message) errors.
+    @abstractmethod
+    def save(self, stock_list):
+        pass
+
+    # Last stored day of each stock as {symbol: datetime.date}, leaving out stocks with no
+    # history (see stock_data.gap_start_dates). This loads every stock; backends that can
+    # find the last day without that override it.
+    def last_dates(self):
+        stock_list = []
+        self.load(stock_list)
+        return {stock.symbol: stock.series.dates[-1].item() for stock in stock_list if len(stock.series)}
+
+
+# Summary for backends that rewrite the whole stock list on each save. They can't tell a new
+# row from a changed one, so "inserted" counts both.
+def _snapshot_summary(stock_list):
+    summary = {"inserted": 0, "updated": 0, "skipped": 0, "deleted": 0, "errors": []}
+    for stock in stock_list:
+        changed = stock.changed_count()
+        summary["inserted"] = summary["inserted"] + changed
+        summary["skipped"] = summary["skipped"] + len(stock.series) - changed
+        summary["deleted"] = summary["deleted"] + len(stock.deleted_dates())
+    return summary
+
+def _loaded(stock, progress):
+    stock.mark_clean()
+    if progress is not None:
+        progress(stock)
+
+
+# Stocks kept in memory (copies, so later changes to the stock list don't leak in)
+class MemoryStorage(StorageBackend):
+    def __init__(self):
+        self._stocks = {} # symbol -> (name, shares, dates, close, volume)
+
+    def load(self, stock_list, progress=None, lazy=False):
+        stock_list.clear()
+        for symbol in sorted(self._stocks):
+            name, shares, dates, close, volume = self._stocks[symbol]
+            stock = Stock(symbol, name, shares)
+            stock.series = PriceSeries.from_arrays(dates.copy(), close.copy(), volume.copy())
+            stock_list.append(stock)
+            _loaded(stock, progress)
+
+    def save(self, stock_list):
+        summary = _snapshot_summary(stock_list)
+        stocks = {}
+        for stock in stock_list:
+            stock.series.sort()
+            stocks[stock.symbol] = (stock.name, stock.shares, stock.series.dates.copy(), stock.series.close.copy(), stock.series.volume.copy())
+        self._stocks = stocks
+        for stock in stock_list:
+            stock.mark_clean()
+        return summary
+
+    def last_dates(self):
+        return {symbol: stock[2][-1].item() for symbol, stock in self._stocks.items() if len(stock[2])}
+
+
+# Every stock in one uncompressed .npz file: one array each for symbols, names and shares,
+# the offset of each stock's rows, and the date, close and volume columns of all stocks
+# end to end. Loaded stocks use slices of the column arrays, so nothing is copied per row.
+# A save rewrites the file (written to a temporary file first, then swapped in).
+class NpzStorage(StorageBackend):
+    def __init__(self, path="stocks.npz"):
+        self.path = path
+
+    def load(self, stock_list, progress=None, lazy=False):
+        stock_list.clear()
+        if not os.path.exists(self.path):
+            return
+        with np.load(self.path) as data:
+            symbols = data["symbols"].tolist()
+            names = data["names"].tolist()
+            shares = data["shares"].tolist()
+            offsets = data["offsets"]
+            dates = data["dates"]
+            close = data["close"]
+            volume = data["volume"]
+        for i, symbol in enumerate(symbols):
+            start, end = offsets[i], offsets[i + 1]
+            stock = Stock(symbol, names[i], shares[i])
+            stock.series = PriceSeries.from_arrays(dates[start:end], close[start:end], volume[start:end], is_sorted=True)
+            stock_list.append(stock)
+            _loaded(stock, progress)
+
+    def save(self, stock_list):
+        summary = _snapshot_summary(stock_list)
+        stocks = sorted(stock_list, key=lambda stock: stock.symbol)
+        for stock in stocks:
+            stock.series.sort()
+        offsets = np.zeros(len(stocks) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(stock.series) for stock in stocks])
+        def column(name, dtype):
+            return np.concatenate([getattr(stock.series, name) for stock in stocks]) if stocks else np.empty(0, dtype=dtype)
+        temp = self.path + ".tmp"
+        with open(temp, "wb") as file:
+            np.savez(file,
+                     symbols=np.array([stock.symbol for stock in stocks], dtype=str),
+                     names=np.array([stock.name for stock in stocks], dtype=str),
+                     shares=np.array([stock.shares for stock in stocks], dtype=np.float64),
+                     offsets=offsets,
+                     dates=column("dates", "datetime64[D]"),
+                     close=column("close", np.float64),
+                     volume=column("volume", np.float64))
+        os.replace(temp, self.path)
+        for stock in stock_list:
+            stock.mark_clean()
+        return summary
+
+    # Reads only the symbols, offsets and dates
+    def last_dates(self):
+        if not os.path.exists(self.path):
+            return {}
+        with np.load(self.path) as data:
+            symbols = data["symbols"].tolist()
+            offsets = data["offsets"]
+            dates = data["dates"]
+        return {symbol: dates[offsets[i + 1] - 1].item() for i, symbol in enumerate(symbols) if offsets[i + 1] > offsets[i]}
+
+
+# One fixed-width record per day (24 bytes, little endian)
+HISTORY_RECORD = np.dtype([("date", "<M8[D]"), ("close", "<f8"), ("volume", "<f8")])
+
+# A folder with stocks.json (symbol, name, shares and history file of each stock) and one
+# .bin file of HISTORY_RECORD rows per stock, oldest first. Loading maps each file with
+# numpy.memmap and uses its fields as the series columns, so nothing is read or converted
+# up front - the OS pages rows in as they are used. The maps are copy-on-write: changes stay
+# in memory until saved. A save writes only the stocks with changes, each to a new file
+# (SYMBOL.<save number>.bin), then switches stocks.json over to it. Files still in use by a
+# loaded series are never replaced; old files are removed once nothing maps them any more
+# (Windows won't delete a mapped file, so those are tried again on the next save).
+class MmapStorage(StorageBackend):
+    def __init__(self, folder="history"):
+        self.folder = folder
+
+    def _index_file(self):
+        return os.path.join(self.folder, "stocks.json")
+
+    # Saved index: {"save": number of the last save, "stocks": [entries]}
+    def _read_index(self):
+        index = self._index_file()
+        if not os.path.exists(index):
+            return {"save": 0, "stocks": []}
+        with open(index, encoding="utf-8") as file:
+            return json.load(file)
+
+    # Map a history file (a name in the folder) as a series
+    def open_series(self, name):
+        filename = os.path.join(self.folder, name)
+        if not os.path.exists(filename) or os.path.getsize(filename) < HISTORY_RECORD.itemsize:
+            return PriceSeries()
+        records = np.memmap(filename, dtype=HISTORY_RECORD, mode="c")
+        return PriceSeries.from_arrays(records["date"], records["close"], records["volume"], is_sorted=True)
+
+    def load(self, stock_list, progress=None, lazy=False):
+        stock_list.clear()
+        for entry in sorted(self._read_index()["stocks"], key=lambda entry: entry["symbol"]):
+            stock = Stock(entry["symbol"], entry["name"], entry["shares"])
+            stock.series = self.open_series(entry.get("history", stock.symbol + ".bin"))
+            stock_list.append(stock)
+            _loaded(stock, progress)
+
+    def save(self, stock_list):
+        summary = _snapshot_summary(stock_list)
+        os.makedirs(self.folder, exist_ok=True)
+        saved = self._read_index()
+        number = saved.get("save", 0) + 1
+        files = {entry["symbol"]: entry.get("history", entry["symbol"] + ".bin") for entry in saved["stocks"]}
+        entries = []
+        for stock in stock_list:
+            name = files.get(stock.symbol)
+            if stock.has_changes or name is None or not os.path.exists(os.path.join(self.folder, name)):
+                name = f"{stock.symbol}.{number}.bin"
+                stock.series.sort()
+                records = np.empty(len(stock.series), dtype=HISTORY_RECORD)
+                records["date"] = stock.series.dates
+                records["close"] = stock.series.close
+                records["volume"] = stock.series.volume
+                records.tofile(os.path.join(self.folder, name))
+            entries.append({"symbol": stock.symbol, "name": stock.name, "shares": stock.shares, "history": name})
+        index = self._index_file()
+        with open(index + ".tmp", "w", encoding="utf-8") as file:
+            json.dump({"save": number, "stocks": entries}, file, indent=1)
+        os.replace(index + ".tmp", index)
+        # replaced history files and those of stocks no longer in the list
+        in_use = {entry["history"] for entry in entries}
+        for name in os.listdir(self.folder):
+            if name.endswith(".bin") and name not in in_use:
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                except OSError: # still mapped (Windows) - removed by a later save
+                    pass
+        for stock in stock_list:
+            stock.mark_clean()
+        return summary
@@ -0,0 +1,101 @@
+# Summary: This module runs long operations (database load/save, web scraping, CSV imports) on a
+# worker thread so the GUI stays responsive. The worker posts progress and results to a queue;
+# the GUI calls poll() from its main loop (Tk after()) to run the callbacks on the main thread.
+
+import queue
+import threading
+
+# Raised inside a task when it has been cancelled
+class TaskCancelled(Exception):
+    pass
+
+# One running operation. The task function receives it as its first argument and
+# calls progress(value) as results come in; progress raises TaskCancelled once
+# cancel() has been called, so the function stops at its next progress report.
+class Task:
+    def __init__(self, name, events):
+        self.name = name
+        self._events = events
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    # Raise TaskCancelled if the task has been cancelled
+    def check(self):
+        if self._cancel.is_set():
+            raise TaskCancelled(self.name + " cancelled")
+
+    # Send a value to the task's progress callback (on the main thread)
+    def progress(self, value):
+        self.check()
+        self._events.put((self, "progress", value))
+
+
+# Runs one task at a time on a background thread.
+#   runner.start(name, function, *args, progress=..., done=..., error=...)
+# function(task, *args) runs on the worker thread. The callbacks run in poll():
+# progress(value) for each task.progress(value), then done(result) when the
+# function returns or error(exception) if it raised (TaskCancelled when cancelled).
+class TaskRunner:
+    def __init__(self):
+        self._events = queue.Queue()
+        self._task = None
+        self._callbacks = {}
+
+    @property
+    def busy(self):
+        return self._task is not None
+
+    @property
+    def current(self):
+        return self._task
+
+    def start(self, name, function, *args, progress=None, done=None, error=None):
+        if self._task is not None:
+            raise RuntimeError(self._task.name + " is still running")
+        task = Task(name, self._events)
+        self._task = task
+        self._callbacks[task] = (progress, done, error)
+        thread = threading.Thread(target=self._run, args=(task, function, args), name=name, daemon=True)
+        thread.start()
+        return task
+
+    def _run(self, task, function, args):
+        try:
+            result = function(task, *args)
+        except BaseException as e:
+            self._events.put((task, "error", e))
+        else:
+            self._events.put((task, "done", result))
+
+    # Cancel the running task (it stops at its next progress report)
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    # Deliver waiting events to their callbacks. Call this from the main thread.
+    # Returns True while a task is still running.
+    def poll(self):
+        while True:
+            try:
+                task, kind, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            progress, done, error = self._callbacks.get(task, (None, None, None))
+            if kind == "progress":
+                if progress is not None:
+                    progress(value)
+                continue
+            del self._callbacks[task]
+            if task is self._task:
+                self._task = None
+            if kind == "done" and done is not None:
+                done(value)
+            elif kind == "error" and error is not None:
+                error(value)
+        return self._task is not None
@@ -0,0 +1,165 @@
+# Summary: Tests for the technical indicators, checked against plain loops that follow
+# the textbook definitions, and for the streaming IndicatorState.
+# Run with: python -m pytest -q
+
+import math
+import statistics
+import numpy as np
+import pytest
+import analytics
+from stock_class import Stock, DailyData, PriceSeries
+
+# Random walk closes, always positive
+def closes(count, seed=1):
+    rng = np.random.default_rng(seed)
+    return 100.0 * np.cumprod(1.0 + rng.normal(0.0, 0.02, count))
+
+def reference_sma(values, window):
+    return [statistics.fmean(values[i + 1 - window:i + 1]) if i + 1 >= window else math.nan for i in range(len(values))]
+
+def reference_ema(values, span):
+    alpha = 2.0 / (span + 1.0)
+    result = []
+    for value in values:
+        result.append(value if not result else result[-1] + alpha * (value - result[-1]))
+    return result
+
+def reference_volatility(close, window):
+    result = []
+    for i in range(len(close)):
+        if i < window:
+            result.append(math.nan)
+        else:
+            returns = [close[k] / close[k - 1] - 1.0 for k in range(i + 1 - window, i + 1)]
+            result.append(statistics.stdev(returns) * math.sqrt(analytics.TRADING_DAYS))
+    return result
+
+def reference_rsi(close, period):
+    result = [math.nan] * len(close)
+    gains = [max(close[i] - close[i - 1], 0.0) for i in range(1, len(close))]
+    losses = [max(close[i - 1] - close[i], 0.0) for i in range(1, len(close))]
+    if len(close) <= period:
+        return result
+    average_gain = sum(gains[:period]) / period
+    average_loss = sum(losses[:period]) / period
+    for i in range(period, len(close)):
+        if i > period:
+            average_gain = (average_gain * (period - 1) + gains[i - 1]) / period
+            average_loss = (average_loss * (period - 1) + losses[i - 1]) / period
+        result[i] = 100.0 if average_loss == 0.0 else 100.0 - 100.0 / (1.0 + average_gain / average_loss)
+    return result
+
+def assert_matches(actual, expected):
+    assert len(actual) == len(expected)
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-12, equal_nan=True)
+
+@pytest.mark.parametrize("count", [0, 1, 5, 20, 21, 300])
+@pytest.mark.parametrize("window", [1, 2, 20])
+def test_sma(count, window):
+    close = closes(count)
+    assert_matches(analytics.sma(close, window), reference_sma(close.tolist(), window))
+
+# long histories with short spans run the smoothing in several blocks
+@pytest.mark.parametrize("count", [0, 1, 5, 300, 2000])
+@pytest.mark.parametrize("span", [1, 2, 20])
+def test_ema(count, span):
+    close = closes(count)
+    assert_matches(analytics.ema(close, span), reference_ema(close.tolist(), span))
+
+@pytest.mark.parametrize("count", [0, 1, 2, 20, 21, 300])
+@pytest.mark.parametrize("window", [2, 20])
+def test_rolling_volatility(count, window):
+    close = closes(count)
+    assert_matches(analytics.rolling_volatility(close, window), reference_volatility(close.tolist(), window))
+
+def test_rolling_volatility_not_annualized():
+    close = closes(50)
+    expected = np.array(reference_volatility(close.tolist(), 10)) / math.sqrt(analytics.TRADING_DAYS)
+    assert_matches(analytics.rolling_volatility(close, 10, annualize=False), expected)
+
+@pytest.mark.parametrize("count", [0, 1, 14, 15, 16, 300])
+@pytest.mark.parametrize("period", [1, 14])
+def test_rsi(count, period):
+    close = closes(count)
+    assert_matches(analytics.rsi(close, period), reference_rsi(close.tolist(), period))
+
+def test_rsi_one_way_prices():
+    rising = np.arange(1.0, 31.0)
+    assert_matches(analytics.rsi(rising), reference_rsi(rising.tolist(), 14))
+    assert analytics.rsi(rising)[-1] == 100.0
+    assert analytics.rsi(rising[::-1])[-1] == 0.0
+
+def test_bad_windows():
+    for function, window in ((analytics.sma, 0), (analytics.ema, 0), (analytics.rolling_volatility, 1), (analytics.rsi, 0)):
+        with pytest.raises(ValueError):
+            function(closes(10), window)
+
+# Streaming indicators -------------------------------------------------------------
+
+# Windows are 5, 4, 6 and 3 days so short histories cross each of them
+WINDOWS = {"sma_window": 5, "ema_span": 4, "volatility_window": 6, "rsi_period": 3}
+
+def volumes(count, seed=2):
+    return np.random.default_rng(seed).integers(1000, 100000, count).astype(np.float64)
+
+# Last element of each array indicator: what IndicatorState.values() should return
+def expected_values(close, volume, sma_window=20, ema_span=20, volatility_window=20, rsi_period=14):
+    return {
+        "close": close[-1],
+        "return": analytics.daily_returns(close)[-1],
+        "sma": analytics.sma(close, sma_window)[-1],
+        "ema": analytics.ema(close, ema_span)[-1],
+        "volatility": analytics.rolling_volatility(close, volatility_window)[-1],
+        "vwap": analytics.vwap(close, volume)[-1],
+        "drawdown": analytics.drawdown(close)[-1],
+        "max_drawdown": analytics.max_drawdown(close),
+        "rsi": analytics.rsi(close, rsi_period)[-1],
+    }
+
+def assert_same_values(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name in expected:
+        np.testing.assert_allclose(actual[name], expected[name], rtol=1e-9, atol=1e-12, equal_nan=True, err_msg=name)
+
+def make_series(close, volume):
+    return PriceSeries.from_arrays(np.datetime64("2024-01-01") + np.arange(len(close)), close, volume)
+
+@pytest.mark.parametrize("options", [{}, WINDOWS])
+def test_indicator_state_add(options):
+    close, volume = closes(40), volumes(40)
+    state = analytics.IndicatorState(**options)
+    for count in range(1, len(close) + 1):
+        state.add(close[count - 1], volume[count - 1])
+        assert_same_values(state.values(), expected_values(close[:count], volume[:count], **options))
+
+# Built from 0 to 12 days of history (shorter and longer than each window), then fed the rest
+@pytest.mark.parametrize("start", range(13))
+def test_indicator_state_from_series_then_add(start):
+    close, volume = closes(30), volumes(30)
+    state = analytics.IndicatorState.from_series(make_series(close[:start], volume[:start]), **WINDOWS)
+    if start:
+        assert_same_values(state.values(), expected_values(close[:start], volume[:start], **WINDOWS))
+    for count in range(start + 1, len(close) + 1):
+        state.add(close[count - 1], volume[count - 1])
+        assert_same_values(state.values(), expected_values(close[:count], volume[:count], **WINDOWS))
+
+def test_stock_indicators_follow_new_days():
+    close, volume = closes(60), volumes(60)
+    dates = np.datetime64("2024-01-01") + np.arange(60)
+    stock = Stock("AAA", "A Company", 1)
+    stock.add_series(dates[:30], close[:30], volume[:30])
+    state = stock.indicators
+    # days after the last date update the same state through add_data and add_series
+    for i in range(30, 40):
+        stock.add_data(DailyData(dates[i].item(), close[i], volume[i]))
+        assert stock.indicators is state
+        assert_same_values(stock.indicators.values(), expected_values(close[:i + 1], volume[:i + 1]))
+    stock.add_series(dates[40:50], close[40:50], volume[40:50])
+    assert stock.indicators is state
+    assert_same_values(stock.indicators.values(), expected_values(close[:50], volume[:50]))
+    # an earlier day rebuilds it from the history
+    stock.add_data(DailyData(dates[10].item(), 1.0, 1.0))
+    changed_close, changed_volume = close[:50].copy(), volume[:50].copy()
+    changed_close[10], changed_volume[10] = 1.0, 1.0
+    assert stock.indicators is not state
+    assert_same_values(stock.indicators.values(), expected_values(changed_close, changed_volume))
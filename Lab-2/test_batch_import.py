@@ -0,0 +1,49 @@
+# Summary: Tests for importing a folder of CSV files with batch_import.
+# Run with: python -m pytest -q
+
+import os
+import types
+import batch_import
+import stock_csv
+import stock_db
+
+HEADER = "Date,Open,High,Low,Close,Adj Close,Volume\n"
+
+def write_csv(folder, name, days):
+    with open(os.path.join(folder, name), "w") as f:
+        f.write(HEADER)
+        for day in days:
+            f.write(f"2024-01-{day:02d},1,1,1,{day}.5,{day}.5,{day * 100}\n")
+
+def stored_rows(symbol):
+    with stock_db.reader() as conn:
+        return conn.execute("SELECT date, price, volume FROM dailyData WHERE symbol = ? ORDER BY date;", (symbol,)).fetchall()
+
+# Runs in the worker process: stands in for stock_csv.read_stock_columns and kills the
+# worker on a file named CRASH
+def crash_on_file(filename):
+    if os.path.basename(filename).startswith("CRASH"):
+        os._exit(1)
+    return stock_csv.read_stock_columns(filename)
+
+def test_batch_import_folder(database, tmp_path):
+    folder = tmp_path / "drop"
+    folder.mkdir()
+    write_csv(folder, "AAA.csv", [2, 3])
+    write_csv(folder, "AAA_later.csv", [3, 4]) # later file wins for 1/3
+    (folder / "BBB.csv").write_text(HEADER)
+    summary = batch_import.batch_import(str(folder), workers=2, progress=None)
+    assert (summary["files"], summary["imported"], summary["rows"]) == (3, 2, 4)
+    assert [(os.path.basename(filename), message) for filename, message in summary["errors"]] == [("BBB.csv", "No price rows found")]
+    assert stored_rows("AAA") == [("2024-01-02", 2.5, 200.0), ("2024-01-03", 3.5, 300.0), ("2024-01-04", 4.5, 400.0)]
+
+def test_crashed_worker_keeps_written_files(database, tmp_path, monkeypatch):
+    folder = tmp_path / "drop"
+    folder.mkdir()
+    write_csv(folder, "AAA.csv", [2, 3])
+    write_csv(folder, "CRASH.csv", [2])
+    monkeypatch.setattr(batch_import, "stock_csv", types.SimpleNamespace(read_stock_columns=crash_on_file))
+    summary = batch_import.batch_import(str(folder), workers=1, progress=None)
+    assert summary["imported"] == 1
+    assert [os.path.basename(filename) for filename, message in summary["errors"]] == ["CRASH.csv"]
+    assert len(stored_rows("AAA")) == 2
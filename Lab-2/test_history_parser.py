@@ -0,0 +1,20 @@
+# Summary: Tests for the history page parsers, run over pages built by web_fixtures.
+# Run with: python -m pytest -q
+
+from datetime import datetime
+import pytest
+import history_parser
+import web_fixtures
+
+def test_parsers_agree():
+    rows = web_fixtures.history_rows("XYZ", datetime(2023, 1, 1), datetime(2023, 12, 31))
+    page = web_fixtures.history_page("XYZ", rows)
+    results = {name: history_parser.parse_history_page(page, name) for name in history_parser.available_parsers()}
+    assert "soup" in results and "scan" in results
+    for name, history in results.items():
+        assert len(history) == len(rows), name
+        assert history == results["soup"], name
+
+def test_unknown_parser():
+    with pytest.raises(ValueError):
+        history_parser.parse_history_page("<html></html>", "nope")
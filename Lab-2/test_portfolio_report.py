@@ -0,0 +1,73 @@
+# Summary: Tests for the portfolio valuation report.
+# Run with: python -m pytest -q
+
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import portfolio_report
+import stock_data
+import stock_db
+from stock_class import Stock, DailyData, Portfolio
+
+DAY = np.datetime64("2024-01-01")
+
+# Portfolio of stocks with days consecutive days of history: closes start at 100, 200, ...
+# and go up by 1 a day, with 10, 20, ... shares
+def make_portfolio(symbols=("AAA", "BBB", "CCC"), days=5):
+    stock_list = Portfolio()
+    for number, symbol in enumerate(symbols):
+        stock = Stock(symbol, symbol + " Company", 10 * (number + 1))
+        stock.add_series(DAY + np.arange(days), np.arange(days) + 100.0 * (number + 1), np.full(days, 1000.0))
+        stock_list.append(stock)
+    return stock_list
+
+def test_lazy_report_leaves_histories_unloaded(database):
+    stock_data.create_database()
+    stock_data.save_stock_data(make_portfolio())
+    stock_data.set_storage(stock_data.SQLiteStorage(cache_size=1))
+    stock_list = Portfolio()
+    stock_data.load_stock_data(stock_list, lazy=True)
+    summary = portfolio_report.report_for(stock_list).summary()
+    assert not any(stock.series_loaded for stock in stock_list)
+    # closes on the last day are 104, 204 and 304 for 10, 20 and 30 shares
+    assert summary["value"] == 104 * 10 + 204 * 20 + 304 * 30
+    assert summary["change"] == 10 + 20 + 30
+    # loading a history doesn't change the result
+    stock_list[1].series
+    assert portfolio_report.report_for(stock_list).summary()["value"] == summary["value"]
+
+def test_lazy_summary_reads_latest_closes_once(database, monkeypatch):
+    stock_data.create_database()
+    stock_data.save_stock_data(make_portfolio())
+    stock_list = Portfolio()
+    stock_data.load_stock_data(stock_list, lazy=True)
+    reads = []
+    reader = stock_db.reader
+    @contextmanager
+    def counting_reader():
+        reads.append(1)
+        with reader() as conn:
+            yield conn
+    monkeypatch.setattr(stock_db, "reader", counting_reader)
+    report = portfolio_report.PortfolioReport(stock_list)
+    value = report.summary()["value"]
+    assert len(reads) == 3
+    assert report.summary()["value"] == value
+    assert len(reads) == 3
+    # a save can change any stock's closes, so they are read again
+    stock_list[0].add_data(DailyData(datetime(2024, 1, 6), 200.0, 1.0))
+    stock_data.save_stock_data(stock_list)
+    reads.clear()
+    assert report.summary()["value"] == value + (200 - 104) * 10
+    assert len(reads) == 2 # AAA is loaded now
+
+def test_history_follows_series_changes():
+    stock_list = make_portfolio()
+    report = portfolio_report.PortfolioReport(stock_list)
+    first = report.history()
+    assert report.history() is first
+    stock_list[0].update_data(datetime(2024, 1, 5), 0.0, 1.0)
+    dates, values = report.history()
+    assert values[-1] == first[1][-1] - 104 * 10
+    stock_list[1].buy(1)
+    assert report.history()[1][-1] == values[-1] + 204
@@ -0,0 +1,26 @@
+# Summary: Tests for PriceSeries, the columnar daily history kept sorted with one row per date.
+# Run with: python -m pytest -q
+
+import numpy as np
+from stock_class import PriceSeries
+
+DAY = np.datetime64("2024-01-01")
+
+def test_upsert_keeps_dates_sorted_and_unique():
+    series = PriceSeries()
+    assert series.upsert(DAY + 2, 3.0, 30)
+    assert series.upsert(DAY, 1.0, 10)
+    assert series.upsert(DAY + 1, 2.0, 20)
+    assert not series.upsert(DAY + 1, 2.5, 25)
+    assert series.dates.tolist() == (DAY + np.arange(3)).tolist()
+    assert series.close.tolist() == [1.0, 2.5, 3.0]
+    assert series.volume.tolist() == [10.0, 25.0, 30.0]
+
+def test_merge_adds_and_replaces_days():
+    series = PriceSeries.from_arrays(DAY + np.array([0, 2, 4]), [1.0, 3.0, 5.0], [1.0, 1.0, 1.0])
+    # out of order, overlapping, with a repeated date - the later row wins
+    added, replaced = series.merge(DAY + np.array([5, 2, 1, 5]), [6.0, 30.0, 2.0, 60.0], [2.0, 2.0, 2.0, 2.0])
+    assert (added, replaced) == (2, 1)
+    assert series.dates.tolist() == (DAY + np.array([0, 1, 2, 4, 5])).tolist()
+    assert series.close.tolist() == [1.0, 2.0, 30.0, 5.0, 60.0]
+    assert series.merge([], [], []) == (0, 0)
@@ -0,0 +1,38 @@
+# Summary: Tests for the text stock report.
+# Run with: python -m pytest -q
+
+from datetime import datetime
+import numpy as np
+import pytest
+import report_renderer
+import stock_data
+from stock_class import Stock, Portfolio
+
+DAY = np.datetime64("2024-01-01")
+
+@pytest.fixture
+def saved(database):
+    stock_data.create_database()
+    stock_list = Portfolio()
+    for number, symbol in enumerate(("AAA", "BBB")):
+        stock = Stock(symbol, symbol + " Company", 10 * (number + 1))
+        stock.add_series(DAY + np.arange(30), np.arange(30) + 100.0 * (number + 1), np.full(30, 1000.0))
+        stock_list.append(stock)
+    stock_data.save_stock_data(stock_list)
+    return stock_list
+
+@pytest.mark.parametrize("start, end, limit", [(None, None, None), (None, None, 5), (datetime(2024, 1, 10), datetime(2024, 1, 20), None),
+                                               (datetime(2024, 1, 10), None, 3), (None, datetime(2024, 1, 4), 0)])
+def test_lazy_report_matches_loaded_report(saved, start, end, limit):
+    lazy = Portfolio()
+    stock_data.load_stock_data(lazy, lazy=True)
+    lines = report_renderer.report_lines(lazy, start, end, limit)
+    assert not any(stock.series_loaded for stock in lazy) # only the windows were read
+    loaded = Portfolio()
+    stock_data.load_stock_data(loaded)
+    assert lines == report_renderer.report_lines(loaded, start, end, limit)
+
+def test_report_window(saved):
+    lines = report_renderer.report_lines(saved, datetime(2024, 1, 10), datetime(2024, 1, 20), 2)
+    rows = [line for line in lines if line.startswith("01/")]
+    assert [row.split()[0] for row in rows] == ["01/19/24", "01/20/24"] * 2
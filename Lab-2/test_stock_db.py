@@ -0,0 +1,78 @@
+# Summary: Tests for stock_db connection handling: transactions and the reader pool.
+# Run with: python -m pytest -q
+
+import sqlite3
+import pytest
+import stock_db
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = stock_db.ConnectionManager(str(tmp_path / "test.db"))
+    with manager.transaction() as conn:
+        conn.execute("CREATE TABLE items (name TEXT);")
+    yield manager
+    manager.close()
+
+def names(manager):
+    with manager.reader() as conn:
+        return [name for name, in conn.execute("SELECT name FROM items ORDER BY name;")]
+
+def test_transaction_commits(manager):
+    with manager.transaction() as conn:
+        conn.execute("INSERT INTO items VALUES ('a');")
+    assert names(manager) == ["a"]
+
+def test_transaction_rolls_back_on_error(manager):
+    with pytest.raises(ValueError):
+        with manager.transaction() as conn:
+            conn.execute("INSERT INTO items VALUES ('a');")
+            raise ValueError("stop")
+    assert names(manager) == []
+    # the writer is usable again afterwards
+    with manager.transaction() as conn:
+        conn.execute("INSERT INTO items VALUES ('b');")
+    assert names(manager) == ["b"]
+
+def test_nested_transaction_joins_the_outer_one(manager):
+    with manager.transaction() as outer:
+        outer.execute("INSERT INTO items VALUES ('a');")
+        with manager.transaction() as inner:
+            assert inner is outer
+            inner.execute("INSERT INTO items VALUES ('b');")
+        assert names(manager) == [] # nothing committed until the outer block ends
+    assert names(manager) == ["a", "b"]
+
+def test_error_in_nested_transaction_rolls_back_everything(manager):
+    with pytest.raises(ValueError):
+        with manager.transaction() as outer:
+            outer.execute("INSERT INTO items VALUES ('a');")
+            with manager.transaction() as inner:
+                inner.execute("INSERT INTO items VALUES ('b');")
+                raise ValueError("stop")
+    assert names(manager) == []
+
+def test_readers_reuse_pooled_connections(manager):
+    with manager.reader() as first:
+        pass
+    with manager.reader() as again:
+        assert again is first
+        # a second reader at the same time gets its own connection
+        with manager.reader() as other:
+            assert other is not first
+
+def test_reader_transaction_is_rolled_back(manager):
+    with manager.reader() as conn:
+        conn.execute("BEGIN;")
+        conn.execute("SELECT * FROM items;").fetchall()
+    with manager.reader() as again:
+        assert again is conn and not again.in_transaction
+
+def test_close_while_reading(manager):
+    with manager.reader() as borrowed:
+        manager.close()
+    # the closed connection is not handed out again
+    with manager.reader() as conn:
+        assert conn is not borrowed
+        assert conn.execute("SELECT COUNT(*) FROM items;").fetchone() == (0,)
+    with pytest.raises(sqlite3.ProgrammingError):
+        borrowed.execute("SELECT 1;")
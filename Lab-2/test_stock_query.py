@@ -0,0 +1,51 @@
+# Summary: Tests for the read-only history queries in stock_query.
+# Run with: python -m pytest -q
+
+from datetime import date, datetime
+import numpy as np
+import pytest
+import stock_data
+import stock_query
+from stock_class import Stock, Portfolio
+
+@pytest.fixture
+def history(database):
+    # AAA trades Mon 1/1/24 - Fri 1/12/24 (no weekend rows), close = day of the month
+    stock_data.create_database()
+    days = np.array([day for day in np.datetime64("2024-01-01") + np.arange(12) if np.is_busday(day)])
+    stock = Stock("AAA", "A Company", 1)
+    stock.add_series(days, [float(day.item().day) for day in days], np.full(len(days), 100.0))
+    stock_data.save_stock_data(Portfolio([stock]))
+    return [day.item() for day in days]
+
+def days_of(rows):
+    return [daily_data.date.date() for daily_data in rows]
+
+def test_get_history_ranges(history):
+    assert days_of(stock_query.get_history("AAA")) == history
+    assert days_of(stock_query.get_history("AAA", start=datetime(2024, 1, 9))) == history[6:]
+    assert days_of(stock_query.get_history("AAA", end=date(2024, 1, 3))) == history[:3]
+    # m/d/yy strings, both ends inclusive
+    assert days_of(stock_query.get_history("AAA", "1/3/24", "1/8/24")) == history[2:6]
+    assert stock_query.get_history("AAA", "1/13/24", "1/20/24") == []
+    assert stock_query.get_history("ZZZ") == []
+
+def test_get_history_values(history):
+    row = stock_query.get_history("AAA", "1/5/24", "1/5/24")[0]
+    assert (row.date, row.close, row.volume) == (datetime(2024, 1, 5), 5.0, 100.0)
+
+def test_get_latest(history):
+    assert days_of(stock_query.get_latest("AAA", 3)) == history[-3:]
+    assert days_of(stock_query.get_latest("AAA", 100)) == history
+    assert stock_query.get_latest("AAA", 0) == []
+
+def test_get_close_on(history):
+    assert stock_query.get_close_on("AAA", date(2024, 1, 5)) == 5.0
+    # weekend - the Friday close
+    assert stock_query.get_close_on("AAA", "1/6/24") == 5.0
+    assert stock_query.get_close_on("AAA", datetime(2024, 1, 7)) == 5.0
+    assert stock_query.get_close_on("AAA", date(2023, 12, 31)) is None
+
+def test_bad_date_type(history):
+    with pytest.raises(TypeError):
+        stock_query.get_history("AAA", start=20240101)
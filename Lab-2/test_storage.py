@@ -0,0 +1,177 @@
+# Summary: Tests for saving and loading stocks. Tests that use the database get their own
+# stocks.db in a temporary folder (see the database fixture in conftest.py).
+# Run with: python -m pytest -q
+
+import sqlite3
+from datetime import date, datetime
+import numpy as np
+import pytest
+import stock_data
+import stock_db
+import storage
+from stock_class import Stock, DailyData, Portfolio
+
+DAY = np.datetime64("2024-01-01")
+
+# Portfolio of stocks with days consecutive days of history each
+def make_portfolio(symbols=("AAA", "BBB"), days=10):
+    stock_list = Portfolio()
+    for number, symbol in enumerate(symbols):
+        stock = Stock(symbol, symbol + " Company", 10 * (number + 1))
+        stock.add_series(DAY + np.arange(days), np.arange(days) + 100.0 * (number + 1), np.full(days, 1000.0))
+        stock_list.append(stock)
+    return stock_list
+
+def assert_same_history(a, b):
+    assert [stock.symbol for stock in a] == [stock.symbol for stock in b]
+    for x, y in zip(a, b):
+        assert (x.name, x.shares) == (y.name, y.shares)
+        assert np.array_equal(x.series.dates, y.series.dates)
+        assert np.array_equal(x.series.close, y.series.close)
+        assert np.array_equal(x.series.volume, y.series.volume)
+
+# Save stock_list, load it back into a new portfolio and check both match
+def save_and_reload(stock_list):
+    summary = stock_data.save_stock_data(stock_list)
+    loaded = Portfolio()
+    stock_data.load_stock_data(loaded)
+    assert_same_history(loaded, stock_list)
+    return summary
+
+
+def test_save_writes_only_changes(database):
+    stock_data.create_database()
+    stock_list = make_portfolio()
+    summary = save_and_reload(stock_list)
+    assert summary["inserted"] == 2 + 20 and summary["errors"] == []
+    assert not any(stock.has_changes for stock in stock_list)
+    # nothing changed - nothing written
+    summary = stock_data.save_stock_data(stock_list)
+    assert (summary["inserted"], summary["updated"], summary["deleted"]) == (0, 0, 0)
+    stock = stock_list[0]
+    stock.update_data(datetime(2024, 1, 3), 999.0, 5.0)
+    stock.add_data(DailyData(datetime(2024, 2, 1), 111.0, 6.0))
+    stock.remove_data(datetime(2024, 1, 1))
+    summary = save_and_reload(stock_list)
+    assert (summary["inserted"], summary["updated"], summary["deleted"]) == (1, 1, 1)
+
+def test_removed_day_added_again_is_saved(database):
+    stock_data.create_database()
+    stock_list = make_portfolio(("AAA",), 5)
+    stock_data.save_stock_data(stock_list)
+    # the same day as a date, a datetime and a numpy day
+    stock_list[0].remove_data(date(2024, 1, 2))
+    stock_list[0].add_data(DailyData(datetime(2024, 1, 2), 9.0, 9.0))
+    stock_list[0].update_data(np.datetime64("2024-01-02"), 9.5, 9.0)
+    summary = save_and_reload(stock_list)
+    assert (summary["inserted"], summary["updated"], summary["deleted"]) == (0, 1, 0)
+    assert stock_list[0].series.close[1] == 9.5
+
+def test_removed_day_from_added_series_stays_removed(database):
+    stock_data.create_database()
+    stock_list = make_portfolio(("AAA",), 5)
+    stock_data.save_stock_data(stock_list)
+    stock_list[0].add_series(DAY + np.arange(3, 8), np.full(5, 7.0), np.full(5, 7.0))
+    stock_list[0].remove_data(DAY + 4)
+    stock_list[0].remove_data(datetime(2024, 1, 7))
+    save_and_reload(stock_list)
+    assert len(stock_list[0].series) == 6
+
+def test_save_reports_invalid_rows(database):
+    stock_data.create_database()
+    stock_list = make_portfolio(("AAA", "BBB"), 3)
+    stock_list[0].add_data(DailyData(datetime(2024, 2, 1), float("nan"), 1.0))
+    summary = stock_data.save_stock_data(stock_list)
+    assert summary["errors"] == [("AAA", "2024-02-01", "Invalid close nan")]
+    assert stock_list[0].has_changes # kept for the next save
+    assert not stock_list[1].has_changes
+    with stock_db.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM dailyData;").fetchone()[0] == 6
+
+def test_migration_converts_old_dates(database):
+    conn = sqlite3.connect(database)
+    conn.execute("CREATE TABLE stocks (symbol TEXT NOT NULL PRIMARY KEY, name TEXT, shares REAL);")
+    conn.execute("CREATE TABLE dailyData (symbol TEXT NOT NULL, date TEXT NOT NULL, price REAL NOT NULL, volume REAL NOT NULL, PRIMARY KEY (symbol, date));")
+    conn.execute("INSERT INTO stocks VALUES ('AAA', 'A Company', 1);")
+    conn.executemany("INSERT INTO dailyData VALUES ('AAA', ?, ?, 1);",
+                     [("12/29/23", 1.0), ("01/02/24", 2.0), ("2024-01-03", 3.0), ("01/03/24", 30.0), ("garbage", 4.0)])
+    conn.commit()
+    conn.close()
+    assert stock_data.upgrade_database() == stock_data.SCHEMA_VERSION
+    with stock_db.reader() as conn:
+        rows = conn.execute("SELECT date, price FROM dailyData ORDER BY date;").fetchall()
+        rejected = conn.execute("SELECT date FROM dailyDataRejected;").fetchall()
+    # an ISO row already there wins over the old-format row for the same day
+    assert rows == [("2023-12-29", 1.0), ("2024-01-02", 2.0), ("2024-01-03", 3.0)]
+    assert rejected == [("garbage",)]
+    # running it again changes nothing
+    with stock_db.writer() as conn:
+        stock_data._migrate_iso_dates(conn)
+        assert conn.execute("SELECT date, price FROM dailyData ORDER BY date;").fetchall() == rows
+    loaded = Portfolio()
+    stock_data.load_stock_data(loaded)
+    assert loaded[0].series.close.tolist() == [1.0, 2.0, 3.0]
+
+@pytest.fixture(params=["memory", "npz", "mmap", "sqlite"])
+def backend(request, tmp_path, database):
+    if request.param == "memory":
+        return storage.MemoryStorage()
+    if request.param == "npz":
+        return storage.NpzStorage(str(tmp_path / "stocks.npz"))
+    if request.param == "mmap":
+        return storage.MmapStorage(str(tmp_path / "history"))
+    stock_data.create_database()
+    return stock_data.SQLiteStorage()
+
+def test_backend_round_trip(backend):
+    stock_list = make_portfolio(("AAA", "BBB", "CCC"))
+    summary = backend.save(stock_list)
+    assert summary["errors"] == []
+    loaded = Portfolio()
+    backend.load(loaded)
+    assert_same_history(loaded, stock_list)
+    assert not any(stock.has_changes for stock in loaded)
+    # change one stock and drop another
+    loaded[0].add_data(DailyData(datetime(2024, 3, 1), 5.0, 5.0))
+    loaded.remove("BBB")
+    backend.save(loaded)
+    again = Portfolio()
+    backend.load(again)
+    if isinstance(backend, stock_data.SQLiteStorage):
+        assert again.symbols() == ["AAA", "BBB", "CCC"] # the database keeps stocks that weren't deleted from it
+        again.remove("BBB")
+    assert_same_history(again, loaded)
+
+def test_gap_start_dates_use_the_backend(backend, monkeypatch):
+    stock_list = make_portfolio(("AAA", "BBB"))
+    stock_list[1].series = make_portfolio(("BBB",), 3)[0].series
+    stock_list.append(Stock("CCC", "CCC Company", 1)) # no history
+    backend.save(stock_list)
+    monkeypatch.setattr(stock_data, "_storage", backend)
+    assert backend.last_dates() == {"AAA": date(2024, 1, 10), "BBB": date(2024, 1, 3)}
+    empty = Portfolio([Stock(stock.symbol, stock.name, stock.shares) for stock in stock_list])
+    # AAA is up to date; BBB starts the day after its last stored day
+    assert stock_data.gap_start_dates("01/01/24", "01/10/24", empty) == {"BBB": "01/04/24", "CCC": "01/01/24"}
+    # a later day in memory wins over the stored one
+    empty[2].add_data(DailyData(datetime(2024, 1, 5), 1.0, 1.0))
+    assert stock_data.gap_start_dates("01/01/24", "01/10/24", empty)["CCC"] == "01/06/24"
+
+def test_backends_must_load_and_save():
+    class LoadOnly(storage.StorageBackend):
+        def load(self, stock_list, progress=None, lazy=False):
+            pass
+    with pytest.raises(TypeError):
+        LoadOnly()
+
+def test_mmap_storage_keeps_mapped_files(tmp_path):
+    backend = storage.MmapStorage(str(tmp_path))
+    backend.save(make_portfolio(("AAA", "BBB")))
+    loaded = Portfolio()
+    backend.load(loaded)
+    before = sorted(path.name for path in tmp_path.glob("*.bin"))
+    loaded[0].add_data(DailyData(datetime(2024, 3, 1), 5.0, 5.0))
+    backend.save(loaded)
+    after = sorted(path.name for path in tmp_path.glob("*.bin"))
+    # the changed stock goes to a new file; the unchanged one keeps its file
+    assert before == ["AAA.1.bin", "BBB.1.bin"]
+    assert after == ["AAA.2.bin", "BBB.1.bin"]
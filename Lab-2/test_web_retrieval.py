@@ -0,0 +1,66 @@
+# Summary: Tests for web retrieval against the local history page server (web_fixtures).
+# Run with: python -m pytest -q
+
+from datetime import datetime
+import numpy as np
+import pytest
+import stock_data
+import web_cache
+import web_fixtures
+from stock_class import Stock, Portfolio
+
+START = "01/01/24"
+END = "01/31/24"
+
+@pytest.fixture(scope="module")
+def url_template():
+    server, url = web_fixtures.start_server()
+    yield url
+    server.shutdown()
+
+# Rows the fixture server returns for a symbol and m/d/yy range, oldest first
+def expected_rows(symbol, start=START, end=END):
+    rows = web_fixtures.history_rows(symbol, datetime.strptime(start, "%m/%d/%y"), datetime.strptime(end, "%m/%d/%y"))
+    return rows[::-1]
+
+def test_retrieve_stock_web_row_counts(url_template):
+    stock_list = Portfolio([Stock("AAA", "A Company", 10), Stock("BBB", "B Company", 5), Stock("CCC", "C Company", 1)])
+    count = stock_data.retrieve_stock_web(START, END, stock_list, workers=2, use_browser=False, url_template=url_template)
+    assert count == sum(len(expected_rows(stock.symbol)) for stock in stock_list)
+    for stock in stock_list:
+        rows = expected_rows(stock.symbol)
+        assert len(stock.series) == len(rows)
+        assert stock.series.dates.tolist() == [row[0].date() for row in rows]
+        assert np.allclose(stock.series.close, [round(row[5], 2) for row in rows]) # pages show 2 decimals
+        assert stock.series.volume.tolist() == [row[6] for row in rows]
+
+def test_retrieve_stock_web_bad_dates(url_template):
+    stock_list = Portfolio([Stock("AAA", "A Company", 10)])
+    assert stock_data.retrieve_stock_web("2024-01-01", END, stock_list, use_browser=False, url_template=url_template) == 0
+    assert len(stock_list[0].series) == 0
+
+def test_failed_symbol_keeps_the_others(url_template):
+    # the fixture server has no page for BB/X (404)
+    stock_list = Portfolio([Stock("AAA", "A Company", 10), Stock("BB/X", "B Company", 5), Stock("CCC", "C Company", 1)])
+    errors = []
+    count = stock_data.retrieve_stock_web(START, END, stock_list, workers=2, use_browser=False, url_template=url_template, errors=errors)
+    assert count == len(expected_rows("AAA")) + len(expected_rows("CCC"))
+    assert [symbol for symbol, message in errors] == ["BB/X"]
+    assert "404" in errors[0][1]
+    assert [len(stock.series) for stock in stock_list] == [len(expected_rows("AAA")), 0, len(expected_rows("CCC"))]
+
+def test_cached_history_skips_the_network(url_template, tmp_path):
+    cache = web_cache.HistoryCache(str(tmp_path))
+    first = list(stock_data.fetch_stock_history(START, END, ["AAA"], use_browser=False, url_template=url_template, cache=cache))
+    # nothing listens on port 9 - a second fetch must come from the cache
+    offline = "http://127.0.0.1:9/quote/{symbol}/history?period1={start}&period2={end}"
+    second = list(stock_data.fetch_stock_history(START, END, ["AAA"], use_browser=False, url_template=offline, cache=cache))
+    assert len(first) == len(second) == 1
+    for a, b in zip(first[0][1:], second[0][1:]):
+        assert np.array_equal(a, b)
+
+def test_empty_pages_are_not_cached(url_template, tmp_path):
+    cache = web_cache.HistoryCache(str(tmp_path))
+    # a weekend - the page has no price rows
+    assert list(stock_data.fetch_stock_history("01/06/24", "01/07/24", ["AAA"], use_browser=False, url_template=url_template, cache=cache)) == []
+    assert list(tmp_path.iterdir()) == []
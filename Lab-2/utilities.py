@@ -1,6 +1,10 @@
 # Summary: This module contains helper functions for sorting and charting.
 
+import os
 import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from datetime import datetime
 from os import system, name
 
@@ -18,48 +22,107 @@ def sortStocks(stock_list):
 # Function to sort the daily stock data (oldest to newest) for all stocks
 def sortDailyData(stock_list):
     for stock in stock_list:
-        stock.DataList.sort(key=lambda x: x.date)
+        stock.series.sort()
 
-# Function to create stock chart
-def display_stock_chart(stock_list, symbol):
-    date = []
-    price = []
-    volume = []
-    company = ""
-    
-    # Find the selected stock and extract data
-    found = False
-    for stock in stock_list:
-        if stock.symbol == symbol:
-            found = True
-            company = stock.name
-            # Ensure data is sorted before plotting
-            stock.DataList.sort(key=lambda x: x.date)
-            for daily_data in stock.DataList:
-                date.append(daily_data.date)
-                price.append(daily_data.close)
-                volume.append(daily_data.volume)
-    
-    # Check if data exists
-    if not found:
+# Chart points to draw - about two per pixel across a 10 inch, 100 dpi chart.
+# Decades of daily data are reduced to this many points before plotting.
+CHART_POINTS = 2000
+
+# Largest-Triangle-Three-Buckets downsampling: indexes of threshold points (first and
+# last included) that keep the visual shape of the line y over x. Between the end points
+# the data is split into threshold - 2 buckets and from each the point forming the
+# largest triangle with the previous pick and the next bucket's average is kept.
+def downsample_lttb(x, y, threshold):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    index = np.empty(threshold, dtype=np.intp)
+    index[0] = 0
+    index[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_x = x[end:edges[bucket + 2]].mean()
+            next_y = y[end:edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        index[bucket + 1] = previous
+    return index
+
+# (symbol) -> (series id, series version, points, dates, close)
+_chart_cache = {}
+
+# Dates and closes to plot for a stock, downsampled to points and cached until
+# the stock's price history changes
+def chart_data(stock, points=CHART_POINTS):
+    series = stock.series
+    series.sort()
+    cached = _chart_cache.get(stock.symbol)
+    if cached is not None and cached[:3] == (id(series), series.version, points):
+        return cached[3], cached[4]
+    dates = series.dates
+    close = series.close
+    keep = downsample_lttb(dates.astype(np.int64), close, points)
+    dates = dates[keep]
+    close = close[keep]
+    _chart_cache[stock.symbol] = (id(series), series.version, points, dates, close)
+    return dates, close
+
+def _draw_chart(axes, stock, dates, close):
+    axes.plot(dates, close, label='Close Price')
+    axes.set_title(f"{stock.name} ({stock.symbol}) Stock Price")
+    axes.set_xlabel('Date')
+    axes.set_ylabel('Price')
+    axes.legend()
+    axes.grid(True)
+    axes.tick_params(axis='x', labelrotation=45)
+
+# Render a stock's chart to a PNG file without a display (no pyplot, no window)
+def save_stock_chart(stock, filename, points=CHART_POINTS):
+    dates, close = chart_data(stock, points)
+    figure = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figure)
+    _draw_chart(figure.add_subplot(), stock, dates, close)
+    figure.tight_layout()
+    figure.savefig(filename)
+    return filename
+
+# Render a chart for every stock with data into folder as SYMBOL.png (for batch jobs).
+# Returns the files written.
+def save_stock_charts(stock_list, folder, points=CHART_POINTS):
+    os.makedirs(folder, exist_ok=True)
+    return [save_stock_chart(stock, os.path.join(folder, stock.symbol + ".png"), points)
+            for stock in stock_list if len(stock.series) > 0]
+
+# Function to create stock chart. Shows it in a window, or writes a PNG when filename is given.
+def display_stock_chart(stock_list, symbol, filename=None):
+    # Find the selected stock
+    stock = stock_list.get(symbol)
+    if stock is None:
         print(f"Stock {symbol} not found.")
         return
-        
-    if not date:
+
+    if len(stock.series) == 0:
         print(f"No daily data available for {symbol}")
         return
 
     # Create the plot
     try:
-        plt.figure(figsize=(10, 6))
-        plt.plot(date, price, label='Close Price')
-        plt.title(f"{company} ({symbol}) Stock Price")
-        plt.xlabel('Date')
-        plt.ylabel('Price')
-        plt.legend()
-        plt.grid(True)
-        plt.xticks(rotation=45)
+        if filename:
+            save_stock_chart(stock, filename)
+            print(f"Chart saved to {filename}")
+            return
+        dates, close = chart_data(stock)
+        figure = plt.figure(figsize=(10, 6))
+        _draw_chart(figure.gca(), stock, dates, close)
         plt.tight_layout()
         plt.show()
     except Exception as e:
-        print(f"Error displaying chart: {e}")
\ No newline at end of file
+        print(f"Error displaying chart: {e}")
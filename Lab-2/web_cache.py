@@ -0,0 +1,81 @@
+# Summary: This module keeps parsed web price history on disk so repeated retrievals of the same
+# symbol and date range don't go back to the network. Entries are keyed by (symbol, start, end,
+# interval), expire after a time to live and the least recently used are removed once the cache
+# grows past its size limit.
+
+import os
+import re
+import time
+import numpy as np
+
+DEFAULT_FOLDER = "web_cache"
+DEFAULT_TTL = 3600 # seconds
+DEFAULT_MAX_BYTES = 50 * 2**20
+
+class HistoryCache:
+    def __init__(self, folder=DEFAULT_FOLDER, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.folder = folder
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    def _filename(self, symbol, start, end, interval):
+        safe = re.sub(r"[^A-Za-z0-9.\-]", "_", symbol)
+        return os.path.join(self.folder, f"{safe}_{start}_{end}_{interval}.npz")
+
+    # Cached (dates, close, volume) arrays, or None if not cached or expired
+    def get(self, symbol, start, end, interval="1d"):
+        filename = self._filename(symbol, start, end, interval)
+        try:
+            if time.time() - os.path.getmtime(filename) > self.ttl:
+                os.remove(filename)
+                return None
+            with np.load(filename) as data:
+                entry = (data["dates"], data["close"], data["volume"])
+            os.utime(filename, (time.time(), os.path.getmtime(filename))) # last used, for eviction
+            return entry
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, symbol, start, end, interval, dates, close, volume):
+        os.makedirs(self.folder, exist_ok=True)
+        filename = self._filename(symbol, start, end, interval)
+        with open(filename + ".tmp", "wb") as file:
+            np.savez(file, dates=np.asarray(dates, dtype="datetime64[D]"),
+                     close=np.asarray(close, dtype=np.float64), volume=np.asarray(volume, dtype=np.float64))
+        os.replace(filename + ".tmp", filename)
+        self.evict()
+
+    # Remove expired entries, then the least recently used until the cache fits in max_bytes
+    def evict(self):
+        if not os.path.isdir(self.folder):
+            return
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith(".npz"):
+                continue
+            filename = os.path.join(self.folder, name)
+            try:
+                info = os.stat(filename)
+                if now - info.st_mtime > self.ttl:
+                    os.remove(filename)
+                else:
+                    entries.append((info.st_atime, info.st_size, filename))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(filename)
+                total = total - size
+            except OSError:
+                continue
+
+    def clear(self):
+        if not os.path.isdir(self.folder):
+            return
+        for name in os.listdir(self.folder):
+            if name.endswith(".npz"):
+                os.remove(os.path.join(self.folder, name))
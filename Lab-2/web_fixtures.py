@@ -0,0 +1,101 @@
+# Summary: This module builds Yahoo! Finance style history pages and serves them from a local
+# web server, so web retrieval can be tested and benchmarked without going to the internet.
+# Run it stand-alone to start a server, then point retrieve_stock_web at LOCAL_HISTORY_URL.
+
+import sys
+import threading
+import zlib
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+LOCAL_HISTORY_URL = "http://127.0.0.1:{port}/quote/{{symbol}}/history?period1={{start}}&period2={{end}}"
+
+# Trading days (Mon-Fri) from start to end with made-up but repeatable prices for a symbol.
+# Returns (date, open, high, low, close, adj close, volume) tuples, newest first like Yahoo.
+def history_rows(symbol, start, end):
+    rows = []
+    price = 20.0 + zlib.crc32(symbol.encode()) % 200
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            step = ((zlib.crc32((symbol + day.isoformat()).encode()) % 2001) - 1000) / 50000.0
+            price = max(1.0, price * (1.0 + step))
+            volume = 1000000 + zlib.crc32(day.isoformat().encode()) % 9000000
+            rows.append((day, price * 0.99, price * 1.01, price * 0.98, price, price, volume))
+        day = day + timedelta(days=1)
+    rows.reverse()
+    return rows
+
+# HTML page laid out like a Yahoo! Finance history table (7 column data rows plus
+# the dividend/split rows and header rows the parsers have to skip)
+def history_page(symbol, rows):
+    parts = ["<!DOCTYPE html><html><head><title>", symbol, " History</title></head><body>",
+             '<div id="quote-header"><h1>', symbol, "</h1></div>",
+             '<table class="W(100%) M(0)"><thead><tr class="C($tertiaryColor) Fz(xs) Ta(end)">',
+             "<th><span>Date</span></th><th><span>Open</span></th><th><span>High</span></th>",
+             "<th><span>Low</span></th><th><span>Close*</span></th><th><span>Adj Close**</span></th>",
+             "<th><span>Volume</span></th></tr></thead><tbody>"]
+    for index, (day, open_price, high, low, close, adj_close, volume) in enumerate(rows):
+        parts.append('<tr class="BdT Bdc($seperatorColor) Ta(end) Fz(s) Whs(nw)">')
+        parts.append(f'<td class="Py(10px) Ta(start) Pend(10px)"><span>{day.strftime("%b %d, %Y")}</span></td>')
+        for value in (open_price, high, low, close, adj_close):
+            parts.append(f'<td class="Py(10px) Pstart(10px)"><span>{value:,.2f}</span></td>')
+        parts.append(f'<td class="Py(10px) Pstart(10px)"><span>{volume:,}</span></td></tr>')
+        if index % 60 == 59:
+            parts.append('<tr class="BdT Bdc($seperatorColor) Ta(end) Fz(s) Whs(nw)">')
+            parts.append(f'<td class="Py(10px) Ta(start) Pend(10px)"><span>{day.strftime("%b %d, %Y")}</span></td>')
+            parts.append('<td class="Ta(c) Py(10px) Pstart(10px)" colspan="6"><strong>0.23</strong> <span>Dividend</span></td></tr>')
+    parts.append('</tbody><tfoot><tr><td colspan="7"><span>*Close price adjusted for splits.</span></td></tr></tfoot>')
+    parts.append("</table></body></html>")
+    return "".join(parts)
+
+# Write a saved page for symbol covering years of daily history ending on end
+def save_history_page(filename, symbol, years, end=datetime(2024, 12, 31)):
+    rows = history_rows(symbol, end - timedelta(days=int(years * 365.25)), end)
+    with open(filename, "w", encoding="utf-8") as page:
+        page.write(history_page(symbol, rows))
+    return len(rows)
+
+class _HistoryHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "quote" or parts[2] != "history":
+            self.send_error(404)
+            return
+        query = parse_qs(url.query)
+        try:
+            start = datetime.fromtimestamp(int(query["period1"][0]))
+            end = datetime.fromtimestamp(int(query["period2"][0]))
+        except (KeyError, ValueError):
+            self.send_error(400)
+            return
+        body = history_page(parts[1], history_rows(parts[1], start, end)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Start a history page server on a background thread.
+# Returns (server, url_template); call server.shutdown() when finished.
+def start_server(port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), _HistoryHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, LOCAL_HISTORY_URL.format(port=server.server_address[1])
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    server = ThreadingHTTPServer(("127.0.0.1", port), _HistoryHandler)
+    print("Serving history pages - use url_template=" + LOCAL_HISTORY_URL.format(port=port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()